@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Claude Conversation Explorer - Benchmarks
+Measures ingest, list, fetch, search, stats, message formatting and splitting on a
+synthetic export, and compares the results with a saved baseline.
+
+Each stage runs in a fresh Python process, so the peak RSS reported is its
+own. Everything runs locally against files generated with
+generate_export.py (or an existing export passed with ``--data``).
+
+Usage:
+    python3 bench.py --save baseline.json      # record a baseline
+    python3 bench.py --compare baseline.json   # exit 1 on a regression
+
+Short stages are noisy; ``--repeat 3`` keeps the fastest of three runs.
+``ingest_warm`` reuses the index built by ``ingest_cold``.
+"""
+
+import argparse
+import http.client
+import json
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+STAGES = ('ingest_cold', 'ingest_warm', 'list', 'fetch', 'fetch_full', 'search', 'stats', 'format', 'split')
+TOLERANCE = 0.15  # a result this much worse than the baseline is a regression
+# Smaller absolute changes are timer and scheduler noise, however large relatively
+NOISE_FLOOR = {'seconds': 0.05, 'p50_ms': 1.0, 'p99_ms': 2.0, 'peak_rss_mb': 2.0}
+
+
+def percentile(values, q):
+    """Return the q-th percentile (0-100) of ``values``, or None if there are none."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def summarize(seconds, ops, latencies=(), **extra):
+    """Build a stage result from its wall time, operation count and per-operation latencies."""
+    import metrics
+
+    result = {
+        'seconds': seconds,
+        'ops': ops,
+        'throughput': ops / seconds if seconds else None,
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'peak_rss_mb': (metrics.max_resident_memory_bytes() or 0) / (1024 * 1024),
+    }
+    result.update(extra)
+    return result
+
+
+def open_server(data_dir, work_dir):
+    """Load the explorer on ``data_dir``, with its index in ``work_dir``, and return its module."""
+    import server
+
+    server.DATA_DIR = Path(data_dir)
+    server.INDEX_DIR = Path(work_dir) / ".claude-explorer"
+    server.load_conversations()
+    return server
+
+
+def start_http(server):
+    """Serve the explorer on a free port in the background; return a connection to it."""
+    server.ConversationHandler.log_message = lambda *args: None
+    httpd = server.ExplorerServer(('localhost', 0), server.ConversationHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return http.client.HTTPConnection('localhost', httpd.server_address[1])
+
+
+def timed_requests(conn, paths):
+    """GET each path over one keep-alive connection; return ``(seconds, latencies in ms)``."""
+    latencies = []
+    start = time.perf_counter()
+    for path in paths:
+        t = time.perf_counter()
+        conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+        response = conn.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f"GET {path} returned {response.status}")
+        latencies.append((time.perf_counter() - t) * 1000)
+    return time.perf_counter() - start, latencies
+
+
+def search_queries(server, count, seed):
+    """Return a reproducible mix of queries: words, prefixes, phrases, typos and filters."""
+    rng = random.Random(seed)
+    names = [rec.name for rec in server.store.records.values() if rec.name]
+    queries = []
+    while len(queries) < count:
+        words = rng.choice(names).lower().split()
+        word = rng.choice(words)
+        kind = len(queries) % 6
+        if kind == 0:
+            queries.append(word + ' ')
+        elif kind == 1:
+            queries.append(word[:max(2, len(word) // 2)])
+        elif kind == 2:
+            queries.append(f'"{" ".join(words[:2])}" ')
+        elif kind == 3 and len(word) >= 5:
+            i = rng.randrange(len(word))
+            queries.append(word[:i] + word[i + 1:] + ' ')
+        elif kind == 4:
+            queries.append(f'{word} from:assistant ')
+        else:
+            queries.append(f'{word} in:tool ')
+    return queries
+
+
+def run_stage(stage, data_dir, work_dir, requests, seed):
+    """Run one stage in this process and return its result."""
+    rng = random.Random(seed)
+
+    if stage in ('ingest_cold', 'ingest_warm'):
+        if stage == 'ingest_cold':
+            shutil.rmtree(Path(work_dir) / ".claude-explorer", ignore_errors=True)
+        start = time.perf_counter()
+        server = open_server(data_dir, work_dir)
+        seconds = time.perf_counter() - start
+        size_mb = sum(rec.length for rec in server.store.records.values()) / (1024 * 1024)
+        return summarize(seconds, len(server.store), mb_per_s=size_mb / seconds)
+
+    if stage == 'split':
+        import split_json
+
+        split_json.SOURCE_DIR = Path(data_dir)
+        split_json.OUTPUT_DIR = Path(work_dir) / "split"
+        split_json.STATE_DIR = Path(work_dir) / "split-state"
+        shutil.rmtree(split_json.OUTPUT_DIR, ignore_errors=True)
+        shutil.rmtree(split_json.STATE_DIR, ignore_errors=True)
+        start = time.perf_counter()
+        split_json.split_conversations(full=True)
+        seconds = time.perf_counter() - start
+        manifest = json.loads((split_json.OUTPUT_DIR / "manifest.json").read_text(encoding='utf-8'))
+        return summarize(seconds, manifest['total_conversations'])
+
+    server = open_server(data_dir, work_dir)
+    uuids = sorted(server.store.records)
+
+    if stage == 'format':
+        latencies = []
+        messages = 0
+        start = time.perf_counter()
+        for uuid in rng.sample(uuids, min(requests, len(uuids))):
+            conv = server.get_conversation(uuid)
+            t = time.perf_counter()
+            for msg in conv.get('chat_messages', []):
+                server.format_message_content(msg)
+            latencies.append((time.perf_counter() - t) * 1000)
+            messages += len(conv.get('chat_messages', []))
+        return summarize(time.perf_counter() - start, messages, latencies)
+
+    conn = start_http(server)
+    if stage == 'list':
+        paths = ['/api/conversations'] * requests
+    elif stage == 'fetch':
+        paths = [f'/api/conversation?id={rng.choice(uuids)}&limit=50' for _ in range(requests)]
+    elif stage == 'fetch_full':
+        paths = [f'/api/conversation?id={rng.choice(uuids)}' for _ in range(requests)]
+    elif stage == 'search':
+        from urllib.parse import quote
+        paths = [f'/api/search?q={quote(q)}' for q in search_queries(server, requests, seed)]
+    elif stage == 'stats':
+        from store import format_timestamp
+        days = sorted({rec.created_at // 86400000000 for rec in server.store.records.values()})
+        paths = []
+        for i in range(requests):
+            after, before = sorted(rng.sample(days, 2))
+            interval = ('day', 'week', 'month')[i % 3]
+            paths.append(f'/api/stats?after={format_timestamp(after * 86400000000)[:10]}'
+                         f'&before={format_timestamp(before * 86400000000)[:10]}&interval={interval}')
+    else:
+        raise ValueError(f"unknown stage: {stage}")
+    seconds, latencies = timed_requests(conn, paths)
+    return summarize(seconds, len(paths), latencies)
+
+
+def run_isolated(stage, data_dir, work_dir, requests, seed, verbose):
+    """Run a stage in a child process and return its result."""
+    result_path = Path(work_dir) / f"{stage}.result.json"
+    command = [sys.executable, str(Path(__file__).resolve()), '--stage', stage, '--data', str(data_dir),
+               '--work', str(work_dir), '--requests', str(requests), '--seed', str(seed),
+               '--result', str(result_path)]
+    subprocess.run(command, check=True, stdout=None if verbose else subprocess.DEVNULL)
+    return json.loads(result_path.read_text(encoding='utf-8'))
+
+
+def format_number(value, unit=''):
+    if value is None:
+        return '-'
+    if value >= 100:
+        return f"{value:.0f}{unit}"
+    return f"{value:.1f}{unit}" if value >= 10 else f"{value:.2f}{unit}"
+
+
+def compare(result, baseline):
+    """Return ``(worst change, description)`` of a stage result against its baseline.
+
+    Changes are relative, positive when worse: slower, lower throughput or
+    more memory. Changes within ``NOISE_FLOOR`` are left out.
+    """
+    # Throughput is ops over seconds, so it is as noisy as they are
+    noise = {'throughput': 'seconds'}
+    changes = []
+    for key, lower_is_better in (('seconds', True), ('p50_ms', True), ('p99_ms', True),
+                                 ('throughput', False), ('peak_rss_mb', True)):
+        new, old = result.get(key), baseline.get(key)
+        floor_key = noise.get(key, key)
+        if (not new or not old or result.get(floor_key) is None or baseline.get(floor_key) is None
+                or abs(result[floor_key] - baseline[floor_key]) < NOISE_FLOOR.get(floor_key, 0)):
+            continue
+        change = (new - old) / old if lower_is_better else (old - new) / old
+        changes.append((change, key))
+    if not changes:
+        return 0.0, ''
+    worst, key = max(changes)
+    return worst, f"{key} {worst:+.0%}"
+
+
+def report(results, baseline=None, tolerance=TOLERANCE):
+    """Print a table of results, compared with a baseline if given. Returns the regressed stages."""
+    print(f"\n{'stage':<12} {'ops':>7} {'ops/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'peak RSS':>9}  vs baseline")
+    regressions = []
+    for stage, result in results.items():
+        line = (f"{stage:<12} {result['ops']:>7} {format_number(result['throughput']):>9} "
+                f"{format_number(result['p50_ms']):>8} {format_number(result['p99_ms']):>8} "
+                f"{format_number(result['peak_rss_mb'], 'MB'):>9}")
+        old = (baseline or {}).get('results', {}).get(stage)
+        if old is not None:
+            worst, description = compare(result, old)
+            if worst > tolerance:
+                regressions.append(stage)
+                line += f"  ✗ {description}"
+            else:
+                line += f"  ✓ {description}" if description else "  ✓"
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the explorer on a synthetic export.")
+    parser.add_argument('--data', type=Path, help="existing export directory to use instead of generating one")
+    parser.add_argument('--work', type=Path, help="directory for indexes and generated files (default: temporary)")
+    parser.add_argument('--conversations', type=int, default=2000)
+    parser.add_argument('--truncate', type=int, default=1, help="generated files to cut off part way")
+    parser.add_argument('--requests', type=int, default=200, help="requests per list, fetch and search stage")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help="runs per stage; the fastest is reported")
+    parser.add_argument('--stages', default=','.join(STAGES), help="comma separated stages to run")
+    parser.add_argument('--save', type=Path, help="write the results to this baseline file")
+    parser.add_argument('--compare', type=Path, help="compare the results with this baseline file")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--verbose', action='store_true', help="show the explorer's own output")
+    parser.add_argument('--stage', help=argparse.SUPPRESS)
+    parser.add_argument('--result', type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        # Child process: run one stage and hand the result back through a file
+        result = run_stage(args.stage, args.data, args.work, args.requests, args.seed)
+        args.result.write_text(json.dumps(result), encoding='utf-8')
+        return
+
+    stages = [stage for stage in args.stages.split(',') if stage]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    baseline = None
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+
+    work_dir = args.work or Path(tempfile.mkdtemp(prefix='claude-explorer-bench-'))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        config = {'conversations': args.conversations, 'truncate': args.truncate,
+                  'requests': args.requests, 'seed': args.seed, 'data': str(args.data) if args.data else None}
+        data_dir = args.data
+        if data_dir is None:
+            from generate_export import generate
+
+            data_dir = work_dir / "data"
+            print(f"Generating {args.conversations} conversations in {data_dir}...")
+            generate(data_dir, args.conversations, truncate=args.truncate, seed=args.seed)
+        if baseline is not None and baseline.get('config') != config:
+            print(f"  ⚠ Baseline was recorded with {baseline.get('config')}, comparing anyway")
+
+        results = {}
+        for stage in stages:
+            print(f"Running {stage}...")
+            runs = [run_isolated(stage, data_dir, work_dir, args.requests, args.seed, args.verbose)
+                    for _ in range(max(1, args.repeat))]
+            results[stage] = min(runs, key=lambda result: result['seconds'])
+    finally:
+        if args.work is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    regressions = report(results, baseline, args.tolerance)
+    if args.save:
+        args.save.write_text(json.dumps({'config': config, 'python': sys.version.split()[0],
+                                         'results': results}, indent=2), encoding='utf-8')
+        print(f"\n✓ Baseline written to {args.save}")
+    if regressions:
+        print(f"\n✗ Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Claude Conversation Explorer - Export
+Writes sets of conversations as NDJSON or as a zip of Markdown files.
+
+Both formats are produced one conversation at a time straight from the
+store, so an export of thousands of conversations never exists in memory
+as a whole. NDJSON lines are the conversations' bytes exactly as they are
+in the export files; only Markdown needs them decoded.
+"""
+
+import json
+import re
+import zipfile
+from datetime import datetime, timedelta, timezone
+
+from search_index import block_text
+from store import format_timestamp
+
+FORMATS = ('ndjson', 'markdown')
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)  # the earliest time a zip entry can have
+FENCE_RE = re.compile(r'`{3,}')
+UNSAFE_FILENAME_RE = re.compile(r'[^\w\- ]+')
+
+
+def write_ndjson(f, store, records):
+    """Write each record's conversation to ``f`` as one line of JSON; return how many were written."""
+    written = 0
+    for rec in records:
+        raw = store.read_bytes(rec.uuid)
+        if raw is None:
+            continue
+        if b'\n' in raw or b'\r' in raw:
+            # Strings can't hold raw line breaks, so these are whitespace between tokens
+            raw = raw.replace(b'\n', b' ').replace(b'\r', b' ')
+        f.write(raw)
+        f.write(b'\n')
+        written += 1
+    return written
+
+
+def fence(text, info=''):
+    """Wrap text in a code fence longer than any backtick run inside it."""
+    longest = max((len(run) for run in FENCE_RE.findall(text)), default=2)
+    ticks = '`' * (longest + 1)
+    return f"{ticks}{info}\n{text}\n{ticks}"
+
+
+def message_markdown(msg, tool_names):
+    """Render one message: its text, tool calls and results, and attachments."""
+    sender = str(msg.get('sender') or 'unknown').capitalize()
+    created_at = (msg.get('created_at') or '')[:16].replace('T', ' ')
+    parts = [f"## {sender}" + (f" · {created_at}" if created_at else '')]
+
+    content = [item for item in msg.get('content') or [] if isinstance(item, (dict, str))]
+    if not content and msg.get('text'):
+        content = [msg['text']]
+    for item in content:
+        if isinstance(item, str):
+            parts.append(item)
+        elif item.get('type') == 'text':
+            if item.get('text'):
+                parts.append(item['text'])
+        elif item.get('type') == 'tool_use':
+            tool_input = json.dumps(item.get('input'), indent=2, ensure_ascii=False)
+            parts.append(f"**Tool call: {item.get('name') or 'unknown'}**\n\n{fence(tool_input, 'json')}")
+        elif item.get('type') == 'tool_result':
+            name = item.get('name') or tool_names.get(item.get('tool_use_id')) or 'unknown'
+            error = ' (error)' if item.get('is_error') else ''
+            parts.append(f"**Tool result: {name}**{error}\n\n{fence(block_text(item.get('content')))}")
+
+    for attachment in msg.get('attachments') or []:
+        if isinstance(attachment, dict):
+            text = attachment.get('extracted_content') or ''
+            title = f"**Attachment: {attachment.get('file_name') or 'unnamed'}**"
+            parts.append(f"{title}\n\n{fence(text)}" if text else title)
+    for f in msg.get('files') or []:
+        if isinstance(f, dict):
+            parts.append(f"**File: {f.get('file_name') or 'unnamed'}**")
+    return '\n\n'.join(parts)
+
+
+def conversation_markdown(conv):
+    """Render a conversation as a Markdown document."""
+    messages = [msg for msg in conv.get('chat_messages') or [] if isinstance(msg, dict)]
+    tool_names = {item['id']: item.get('name') for msg in messages for item in msg.get('content') or []
+                  if isinstance(item, dict) and item.get('type') == 'tool_use' and item.get('id')}
+    header = [f"# {conv.get('name') or 'Untitled'}", '']
+    for label, key in (('Created', 'created_at'), ('Updated', 'updated_at'), ('ID', 'uuid')):
+        if conv.get(key):
+            header.append(f"- {label}: {conv[key]}")
+    header.append(f"- Messages: {len(messages)}")
+    if conv.get('summary'):
+        header += ['', *(f"> {line}" for line in conv['summary'].splitlines())]
+    return '\n\n'.join(['\n'.join(header), *(message_markdown(msg, tool_names) for msg in messages)]) + '\n'
+
+
+def markdown_filename(rec, used):
+    """Return a unique ``date-name-uuid.md`` file name for a record, noting it in ``used``."""
+    slug = UNSAFE_FILENAME_RE.sub('', rec.name or '').strip().replace(' ', '-')[:60] or 'untitled'
+    date = format_timestamp(rec.created_at)[:10] or 'undated'
+    name = f"{date}-{slug}-{rec.uuid[:8]}.md"
+    if name in used:
+        name = f"{date}-{slug}-{rec.uuid}.md"
+    used.add(name)
+    return name
+
+
+def zip_date_time(micros):
+    """Return a zip entry's ``date_time`` for a timestamp in microseconds."""
+    if not micros:
+        return ZIP_EPOCH
+    dt = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=micros)
+    return max(ZIP_EPOCH, dt.timetuple()[:6])
+
+
+def write_markdown_zip(f, store, records):
+    """Write a zip with one Markdown file per record to ``f``; return how many were written.
+
+    ``f`` only needs a ``write`` method returning the bytes taken, so the zip
+    can go straight to a socket: entries are written with data descriptors
+    and never seeked back to.
+    """
+    used = set()
+    written = 0
+    with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for rec in records:
+            conv = store.get(rec.uuid)
+            if conv is None:
+                continue
+            info = zipfile.ZipInfo(markdown_filename(rec, used), zip_date_time(rec.updated_at or rec.created_at))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            zf.writestr(info, conversation_markdown(conv).encode('utf-8'))
+            written += 1
+    return written
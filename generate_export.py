@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Claude Conversation Explorer - Synthetic Export Generator
+Writes fake Claude exports (``conversations N.json``) for benchmarks and
+trying things out, with no real data involved.
+
+The same seed always gives the same files. Word frequencies follow Zipf's
+law, so common words are common and search sees a realistic vocabulary;
+assistant turns mix prose, code blocks, tool calls and long tool results.
+
+Usage: python3 generate_export.py OUTPUT_DIR [--conversations 2000] [--truncate 1] ...
+"""
+
+import argparse
+import itertools
+import json
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+MAX_FILES = 4  # the explorer reads conversations 1.json to conversations 4.json
+
+COMMON_WORDS = (
+    "the of and to a in is that for it as with was on be by this are or from at which but not have "
+    "an they you were can all one there their has more will if would about when what so no out up "
+    "into than them some could time these two may then do first any my now such like our over "
+    "python server function error data file code test value list request response index search "
+    "memory stream parse token query result return string number config user message export json"
+).split()
+TOOLS = {
+    'bash': lambda rng, words: {'command': f"{rng.choice(['grep -rn', 'ls -la', 'python3', 'cat', 'git log'])} {words(3)}"},
+    'str_replace_editor': lambda rng, words: {'command': 'str_replace', 'path': f"/src/{words(1)}.py",
+                                              'old_str': words(8), 'new_str': words(10)},
+    'web_search': lambda rng, words: {'query': words(5)},
+    'repl': lambda rng, words: {'code': f"import {words(1)}\nprint({words(1)}({words(2).replace(' ', ', ')}))"},
+}
+
+
+class ExportGenerator:
+    """Generates conversations from a seeded random source."""
+
+    def __init__(self, seed=0, vocabulary=50000, message_words=120, max_messages=40,
+                 tool_rate=0.3, attachment_rate=0.05, tool_result_words=400):
+        self.rng = random.Random(seed)
+        self.message_words = message_words
+        self.max_messages = max_messages
+        self.tool_rate = tool_rate
+        self.attachment_rate = attachment_rate
+        self.tool_result_words = tool_result_words
+
+        # Made-up words after the common ones, drawn with Zipf weights
+        letters = 'abcdefghijklmnopqrstuvwxyz'
+        made_up = {''.join(self.rng.choice(letters) for _ in range(self.rng.randint(3, 11)))
+                   for _ in range(vocabulary)}
+        made_up = sorted(made_up - set(COMMON_WORDS))
+        self.rng.shuffle(made_up)
+        self.words = list(COMMON_WORDS) + made_up
+        self.cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(self.words) + 1)))
+        self.clock = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def uuid(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def text(self, n):
+        """Return ``n`` words of Zipf-distributed text."""
+        return ' '.join(self.rng.choices(self.words, cum_weights=self.cum_weights, k=n))
+
+    def length(self, mean):
+        """Return a message length: mostly short, occasionally very long."""
+        return max(1, int(self.rng.expovariate(1 / mean)))
+
+    def timestamp(self, seconds):
+        self.clock += timedelta(seconds=seconds)
+        return self.clock.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+    def message(self, sender):
+        """Return one chat message, with tool calls and attachments for some."""
+        text = self.text(self.length(self.message_words))
+        if sender == 'assistant' and self.rng.random() < 0.2:
+            text += f"\n\n```python\ndef {self.text(1)}({self.text(1)}):\n    return {self.text(3)}\n```\n"
+        content = [{'type': 'text', 'text': text}]
+
+        if sender == 'assistant':
+            while self.rng.random() < self.tool_rate:
+                name = self.rng.choice(sorted(TOOLS))
+                tool_id = f"toolu_{self.rng.getrandbits(64):016x}"
+                content.append({'type': 'tool_use', 'id': tool_id, 'name': name,
+                                'input': TOOLS[name](self.rng, self.text)})
+                content.append({'type': 'tool_result', 'tool_use_id': tool_id, 'name': name, 'is_error': False,
+                                'content': [{'type': 'text', 'text': self.text(self.length(self.tool_result_words))}]})
+                content.append({'type': 'text', 'text': self.text(self.length(self.message_words // 2))})
+
+        attachments = []
+        if sender == 'human' and self.rng.random() < self.attachment_rate:
+            extracted = self.text(self.length(self.message_words * 10))
+            attachments.append({'file_name': f"{self.text(1)}.txt", 'file_type': 'txt',
+                                'file_size': len(extracted), 'extracted_content': extracted})
+
+        return {
+            'uuid': self.uuid(),
+            'text': text,
+            'content': content,
+            'sender': sender,
+            'created_at': self.timestamp(self.rng.randint(5, 600)),
+            'updated_at': self.clock.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+            'attachments': attachments,
+            'files': [],
+        }
+
+    def conversation(self):
+        """Return one conversation of alternating human and assistant messages."""
+        created_at = self.timestamp(self.rng.randint(600, 86400))
+        count = self.rng.randint(1, self.max_messages)
+        messages = [self.message('human' if i % 2 == 0 else 'assistant') for i in range(count)]
+        return {
+            'uuid': self.uuid(),
+            'name': self.text(self.rng.randint(2, 8)).capitalize(),
+            'summary': self.text(self.rng.randint(10, 40)) if self.rng.random() < 0.5 else '',
+            'created_at': created_at,
+            'updated_at': self.clock.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+            'account': {'uuid': '00000000-0000-4000-8000-000000000000'},
+            'chat_messages': messages,
+        }
+
+
+def generate(output_dir, conversations=2000, files=MAX_FILES, truncate=0, seed=0, **options):
+    """Write ``conversations`` conversations spread over ``files`` export files.
+
+    The last ``truncate`` files are cut off part way through, like an
+    interrupted download. Returns the paths written.
+    """
+    if not 1 <= files <= MAX_FILES:
+        raise ValueError(f"files must be between 1 and {MAX_FILES}")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    generator = ExportGenerator(seed, **options)
+
+    paths = []
+    per_file = -(-conversations // files)
+    for n in range(1, files + 1):
+        count = min(per_file, conversations - per_file * (n - 1))
+        data = json.dumps([generator.conversation() for _ in range(max(count, 0))], ensure_ascii=False)
+        if n > files - truncate:
+            data = data[:generator.rng.randint(len(data) // 2, len(data) - 1)]
+        path = output_dir / f"conversations {n}.json"
+        path.write_text(data, encoding='utf-8')
+        paths.append(path)
+        print(f"  ✓ {path.name}: {count} conversations, {len(data) / (1024 * 1024):.1f}MB"
+              f"{' (truncated)' if n > files - truncate else ''}")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic Claude exports.")
+    parser.add_argument('output_dir', type=Path)
+    parser.add_argument('--conversations', type=int, default=2000)
+    parser.add_argument('--files', type=int, default=MAX_FILES)
+    parser.add_argument('--truncate', type=int, default=0, help="number of files to cut off part way")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--vocabulary', type=int, default=50000, help="made-up words besides common ones")
+    parser.add_argument('--message-words', type=int, default=120, help="mean words per message")
+    parser.add_argument('--max-messages', type=int, default=40, help="most messages per conversation")
+    parser.add_argument('--tool-rate', type=float, default=0.3,
+                        help="chance of each further tool call in an assistant message")
+    parser.add_argument('--tool-result-words', type=int, default=400, help="mean words per tool result")
+    parser.add_argument('--attachment-rate', type=float, default=0.05,
+                        help="chance of an attachment on a human message")
+    args = vars(parser.parse_args())
+    generate(**args)
+
+
+if __name__ == '__main__':
+    main()
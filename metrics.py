@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Claude Conversation Explorer - Metrics
+Counters, gauges and histograms rendered in the Prometheus text format, and
+an opt-in sampling profiler that dumps the hot stacks of slow requests.
+
+Metrics are created once at import time and registered in ``REGISTRY``.
+A metric can be updated as things happen (``inc``, ``set``, ``observe``) or
+given a ``collect`` function that reads the current value at scrape time.
+"""
+
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounts
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_value(value):
+    """Format a sample value the way Prometheus parses it."""
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def format_labels(names, values):
+    """Format label names and values as ``{name="value",...}``."""
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class Metric:
+    """A named metric with optional labels."""
+
+    type = 'untyped'
+
+    def __init__(self, name, help, labels=(), collect=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect
+        self._values = {}  # label values -> value
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self):
+        """Return ``(suffix, label names, label values, value)`` for every sample."""
+        if self.collect is not None:
+            values = self.collect()
+            if values is None:
+                return []
+            if not isinstance(values, dict):
+                values = {(): values}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [('', self.labels, key, value) for key, value in sorted(values.items())]
+
+    def render(self):
+        samples = self.samples()
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        for suffix, names, values, value in samples:
+            lines.append(f'{self.name}{suffix}{format_labels(names, values)} {format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that goes up and down."""
+
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Counts observations into cumulative buckets, plus their sum and count."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        samples = []
+        names = self.labels + ('le',)
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                samples.append(('_bucket', names, key + (format_value(bound),), cumulative))
+            samples.append(('_sum', self.labels, key, total))
+            samples.append(('_count', self.labels, key, count))
+        return samples
+
+
+class Registry:
+    """The metrics exposed by one process."""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help, labels=(), collect=None):
+    return REGISTRY.register(Counter(name, help, labels, collect))
+
+
+def gauge(name, help, labels=(), collect=None):
+    return REGISTRY.register(Gauge(name, help, labels, collect))
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, help, labels, buckets))
+
+
+def resident_memory_bytes():
+    """Return the process's current resident memory, or None where it can't be read."""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def max_resident_memory_bytes():
+    """Return the process's peak resident memory, or None where it can't be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+gauge('process_resident_memory_bytes', 'Resident memory size in bytes.', collect=resident_memory_bytes)
+gauge('process_max_resident_memory_bytes', 'Peak resident memory size in bytes.', collect=max_resident_memory_bytes)
+
+
+def collapse_stack(frame):
+    """Return a frame's stack as ``file:function;...`` from the outermost call in."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{Path(code.co_filename).name}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples the stacks of threads serving requests and dumps those of slow requests.
+
+    A background thread looks at every tracked thread's current frame each
+    ``interval`` seconds. When a request tracked with ``track()`` takes at
+    least ``threshold`` seconds, its samples are written to ``out_dir`` in
+    the collapsed format read by flamegraph.pl and speedscope: one
+    ``frame;frame;frame count`` line per distinct stack.
+    """
+
+    def __init__(self, threshold, out_dir, interval=0.005):
+        self.threshold = threshold
+        self.out_dir = Path(out_dir)
+        self.interval = interval
+        self.dumps = 0
+        self._active = {}  # thread id -> stack counts
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            # Count under the lock: once track() removes a request, its samples are final
+            with self._lock:
+                for ident, counts in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != me:
+                        counts[collapse_stack(frame)] += 1
+            del frames
+
+    @contextmanager
+    def track(self, label):
+        """Sample the calling thread while the block runs; dump the samples if it was slow."""
+        ident = threading.get_ident()
+        counts = StackCounts()
+        with self._lock:
+            self._active[ident] = counts
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._active.pop(ident, None)
+            if elapsed >= self.threshold and counts:
+                self.dump(label, elapsed, counts)
+
+    def dump(self, label, elapsed, counts):
+        """Write one request's samples, hottest stack first."""
+        safe_label = ''.join(c if c.isalnum() else '_' for c in label).strip('_')[:80] or 'request'
+        path = self.out_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}-{elapsed * 1000:.0f}ms.txt"
+        try:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, n in counts.most_common():
+                    f.write(f"{stack} {n}\n")
+        except OSError as e:
+            print(f"  ⚠ Could not write profile to {path}: {e}")
+            return
+        self.dumps += 1
+        print(f"  ⚠ {label} took {elapsed:.2f}s, profile written to {path}")
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
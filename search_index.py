@@ -0,0 +1,1093 @@
+#!/usr/bin/env python3
+"""
+Claude Conversation Explorer - Search Index
+Tokenized inverted index over conversation names, summaries and messages.
+
+The index is made of segments. Each segment is a sorted term dictionary
+(``.meta``, JSON), its numeric columns (``.cols``, raw arrays) and a
+postings file (``.post``) that is memory mapped at query time. For every
+term the postings file holds the units containing it, where each unit's
+token positions start, and the positions used for phrase queries.
+A unit is one searchable piece of text: a conversation name, its summary,
+a message's text, one tool call or tool result, or one attachment.
+
+Each segment also maps the trigrams of its terms to the terms containing
+them. Fuzzy and regex queries use it to find candidate terms without scanning
+the vocabulary, then check only those.
+
+Filters (sender, tool name) are indexed as synthetic terms that start with
+``:``, which no word token can, so they get postings like any other term
+without ever matching a word. Each unit's field and time are stored as
+columns next to its length.
+"""
+
+import base64
+import bisect
+import itertools
+import json
+import math
+import mmap
+import operator
+import os
+import re
+import tempfile
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+from store import parse_timestamp
+
+SEARCH_INDEX_VERSION = 6
+MANIFEST_FILENAME = "segments.json"
+MAX_TOKEN_LENGTH = 64
+MAX_PREFIX_EXPANSIONS = 256
+MAX_FUZZY_EXPANSIONS = 64
+MAX_FUZZY_CANDIDATES = 1000  # words compared per segment for a fuzzy term
+
+TOKEN_RE = re.compile(r'\w+')
+QUERY_RE = re.compile(r'"([^"]*)"?|(\S+)')
+REGEX_RE = re.compile(r'/(.+)/')
+FILTER_RE = re.compile(r'(from|tool|in|after|before):(.+)', re.IGNORECASE)
+DATE_RE = re.compile(r'(\d{4})(?:-(\d{2}))?(?:-(\d{2}))?$')
+
+FIELD_NAME = 0
+FIELD_SUMMARY = 1
+FIELD_MESSAGE = 2
+FIELD_TOOL_USE = 3
+FIELD_TOOL_RESULT = 4
+FIELD_ATTACHMENT = 5
+FIELDS = ('name', 'summary', 'message', 'tool_use', 'tool_result', 'attachment')
+FIELD_WEIGHTS = (3.0, 1.5, 1.0, 0.8, 0.6, 0.8)
+FIELD_ALIASES = {'tool': (FIELD_TOOL_USE, FIELD_TOOL_RESULT)}  # in:tool matches calls and results
+TAG_FILTERS = ('from', 'tool')  # filters looked up as synthetic terms
+WORD_CLAUSES = ('term', 'prefix', 'fuzzy', 'regex', 'phrase')
+
+# Ranking
+BM25_K1 = 1.2
+BM25_B = 0.75
+OTHER_HITS_WEIGHT = 0.1  # share of a conversation's other hits added to its best hit
+MAX_HITS_PER_RESULT = 3
+RANK_CACHE_SIZE = 32
+
+# Snippets
+SNIPPET_LENGTH = 200
+SNIPPET_CONTEXT = 60
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens."""
+    return TOKEN_RE.findall(text.lower())
+
+
+def message_search_text(msg):
+    """Return the searchable text of a message: its text plus structured text blocks."""
+    parts = []
+    if msg.get('text'):
+        parts.append(msg['text'])
+    for item in msg.get('content') or []:
+        if isinstance(item, dict) and item.get('type') == 'text':
+            text = item.get('text') or ''
+        elif isinstance(item, str):
+            text = item
+        else:
+            continue
+        # Exports usually repeat the flat text as a text block
+        if text and text not in parts:
+            parts.append(text)
+    return '\n'.join(parts)
+
+
+def term_grams(term):
+    """Return the trigrams of a term, padded with a space at both ends."""
+    padded = f" {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def fuzzy_edits(term):
+    """Return how many typos a fuzzy match of ``term`` may contain."""
+    if len(term) >= 8:
+        return 2
+    return 1 if len(term) >= 4 else 0
+
+
+def edit_distance(a, b, limit):
+    """Return the edit distance between two strings, counting a swap of neighbours as one edit.
+
+    Only cells within ``limit`` of the diagonal are computed, and it gives up
+    with ``limit + 1`` as soon as the distance must exceed ``limit``.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cost = previous[j - 1] + (a[i - 1] != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1] and before[j - 2] + 1 < cost:
+                cost = before[j - 2] + 1
+            current[j] = cost
+        if min(current) > limit:
+            return over
+        before, previous = previous, current
+    return min(previous[-1], over)
+
+
+def skip_group(pattern, i):
+    """Return the index just past the character class or group starting at ``pattern[i]``."""
+    start = i
+    depth = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            i += 2
+            continue
+        if pattern[start] == '[':
+            # A ']' right after '[' or '[^' is a literal
+            if c == ']' and i > start + 1 and pattern[start + 1:i] != '^':
+                return i + 1
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def regex_literals(pattern):
+    """Return runs of literal characters that every match of a regex must contain.
+
+    Conservative: classes, groups, ``.`` and escapes like ``\\w`` end a run,
+    a character made optional by ``?``, ``*`` or ``{m,n}`` is dropped, and a
+    pattern with ``|`` yields nothing.
+    """
+    if '|' in pattern:
+        return []
+    runs = ['']
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            nxt = pattern[i + 1:i + 2]
+            literal = nxt if nxt and not nxt.isalnum() else None
+            i += 2
+        elif c in '[(':
+            literal = None
+            i = skip_group(pattern, i)
+        elif c in '.^$':
+            literal = None
+            i += 1
+        else:
+            literal = c.lower()
+            i += 1
+
+        quantifier = pattern[i:i + 1]
+        if quantifier == '{':
+            i = pattern.find('}', i) + 1 or len(pattern)
+        elif quantifier in ('?', '*', '+'):
+            i += 1
+        else:
+            quantifier = ''
+        if quantifier and pattern[i:i + 1] == '?':
+            i += 1  # lazy
+
+        if quantifier in ('?', '*', '{'):
+            literal = None
+        if literal is None:
+            runs.append('')
+        else:
+            runs[-1] += literal
+            if quantifier == '+':
+                runs.append('')
+    return [run for run in runs if run]
+
+
+def block_text(value):
+    """Return the text inside a tool input or result: its strings, in order."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        if value.get('type') == 'text':
+            return value.get('text') or ''
+        if value.get('type') == 'image':
+            return ''
+        items = value.values()
+    elif isinstance(value, list):
+        items = value
+    elif value is None or isinstance(value, bool):
+        return ''
+    else:
+        return str(value)
+    return '\n'.join(filter(None, map(block_text, items)))
+
+
+def tool_names(messages):
+    """Return ``{tool_use_id: tool name}`` for the tool calls in a conversation."""
+    names = {}
+    for msg in messages:
+        if not isinstance(msg, dict):
+            continue
+        for item in msg.get('content') or []:
+            if isinstance(item, dict) and item.get('type') == 'tool_use' and item.get('id'):
+                names[item['id']] = item.get('name') or ''
+    return names
+
+
+def message_units(msg, names):
+    """Yield ``(field, block, text, tags)`` for every searchable unit of a message.
+
+    ``block`` is the index of the tool block in ``content`` or of the
+    attachment in ``attachments``, and -1 for the message text. ``tags`` are
+    the synthetic filter terms of the unit.
+    """
+    sender = f":from:{str(msg.get('sender') or 'unknown').lower()}"
+    yield FIELD_MESSAGE, -1, message_search_text(msg), (sender,)
+    for block, item in enumerate(msg.get('content') or []):
+        if not isinstance(item, dict):
+            continue
+        if item.get('type') == 'tool_use':
+            name = item.get('name') or ''
+            text = f"{name}\n{block_text(item.get('input'))}"
+            field = FIELD_TOOL_USE
+        elif item.get('type') == 'tool_result':
+            name = item.get('name') or names.get(item.get('tool_use_id'), '')
+            text = block_text(item.get('content'))
+            field = FIELD_TOOL_RESULT
+        else:
+            continue
+        yield field, block, text, (sender, f":tool:{name.lower()}") if name else (sender,)
+    for block, attachment in enumerate(msg.get('attachments') or []):
+        if isinstance(attachment, dict):
+            text = f"{attachment.get('file_name') or ''}\n{attachment.get('extracted_content') or ''}"
+            yield FIELD_ATTACHMENT, block, text, (sender,)
+
+
+def iter_units(conv):
+    """Yield ``(field, message_index, block, text, tags, ts)`` for every searchable unit.
+
+    ``ts`` is when the unit was written, in microseconds: the message's
+    timestamp, or the conversation's for its name and summary.
+    """
+    created_at = parse_timestamp(conv.get('created_at'))
+    yield FIELD_NAME, -1, -1, conv.get('name') or '', (), created_at
+    yield FIELD_SUMMARY, -1, -1, conv.get('summary') or '', (), created_at
+    messages = conv.get('chat_messages') or []
+    names = tool_names(messages)
+    for i, msg in enumerate(messages):
+        if isinstance(msg, dict):
+            ts = parse_timestamp(msg.get('created_at')) or created_at
+            for field, block, text, tags in message_units(msg, names):
+                yield field, i, block, text, tags, ts
+
+
+def parse_date(value):
+    """Parse ``YYYY``, ``YYYY-MM``, ``YYYY-MM-DD`` or a full timestamp into microseconds."""
+    m = DATE_RE.match(value)
+    if m:
+        value = f"{m[1]}-{m[2] or '01'}-{m[3] or '01'}"
+    micros = parse_timestamp(value)
+    if not micros:
+        raise ValueError(f"invalid date: {value!r}")
+    return micros
+
+
+def parse_filter(key, value):
+    """Parse one ``key:value`` query word into a filter clause. Raises ValueError if invalid."""
+    key = key.lower()
+    if key in TAG_FILTERS:
+        return (key, f":{key}:{value.lower()}")
+    if key == 'in':
+        value = value.lower()
+        if value in FIELD_ALIASES:
+            return ('in', FIELD_ALIASES[value])
+        if value not in FIELDS:
+            raise ValueError(f"unknown field: {value!r}")
+        return ('in', (FIELDS.index(value),))
+    return (key, parse_date(value))
+
+
+def parse_query(query):
+    """Parse a query into clauses that must all match within one unit.
+
+    ``"quoted words"`` is a phrase and ``word*`` is a prefix. The last word is
+    also treated as a prefix while it is still being typed, i.e. when the
+    query does not end in whitespace.
+
+    ``word~`` matches words within a typo or two of ``word`` and ``/regex/``
+    matches words the regular expression finds. A word that is not in the
+    index at all is also matched fuzzily.
+
+    ``from:sender``, ``tool:name``, ``in:field``, ``after:date`` and
+    ``before:date`` are filters on the matching unit. Repeated filters of one
+    kind match either value; ``after`` is inclusive and ``before`` exclusive.
+    Raises ValueError for an unknown field, an invalid date or an invalid regex.
+    """
+    clauses = []
+    for m in QUERY_RE.finditer(query):
+        phrase, word = m.groups()
+        if word is not None:
+            f = FILTER_RE.fullmatch(word)
+            if f:
+                clauses.append(parse_filter(*f.groups()))
+                continue
+            r = REGEX_RE.fullmatch(word)
+            if r:
+                try:
+                    clauses.append(('regex', re.compile(r[1], re.IGNORECASE)))
+                except re.error as e:
+                    raise ValueError(f"invalid regex: {r[1]!r}") from e
+                continue
+        tokens = tokenize(phrase if phrase is not None else word)
+        if not tokens:
+            continue
+        if word is not None and word[-1] in '*~':
+            clauses.extend(('term', t) for t in tokens[:-1])
+            clauses.append(('prefix' if word[-1] == '*' else 'fuzzy', tokens[-1]))
+        elif len(tokens) == 1:
+            clauses.append(('term', tokens[0]))
+        else:
+            clauses.append(('phrase', tokens))
+
+    if clauses and clauses[-1][0] == 'term' and query[-1:].isalnum():
+        clauses[-1] = ('prefix', clauses[-1][1])
+    return clauses
+
+
+def same_contents(a, b):
+    """Return True if two ``{name: signature}`` maps describe the same file contents."""
+    return {name: sig.get('sha1') for name, sig in a.items()} == {name: sig.get('sha1') for name, sig in b.items()}
+
+
+class SegmentBuilder:
+    """Accumulates postings in memory and writes them out as a segment."""
+
+    def __init__(self):
+        self.postings = {}   # term -> array of interleaved (unit, tf)
+        self.positions = {}  # term -> array of token positions, grouped by unit
+        self.conversations = []
+        self.unit_conv = array('I')
+        self.unit_msg = array('i')
+        self.unit_field = array('B')
+        self.unit_len = array('I')
+        self.unit_block = array('i')
+        self.unit_time = array('q')
+
+    def __len__(self):
+        return len(self.conversations)
+
+    def add(self, conv):
+        """Tokenize and index every unit of a conversation."""
+        conv_id = len(self.conversations)
+        self.conversations.append((conv.get('uuid', ''), parse_timestamp(conv.get('updated_at'))))
+
+        for field, msg_index, block, text, tags, ts in iter_units(conv):
+            tokens = tokenize(text)
+            if not tokens:
+                continue
+            unit = len(self.unit_conv)
+            self.unit_conv.append(conv_id)
+            self.unit_msg.append(msg_index)
+            self.unit_field.append(field)
+            self.unit_len.append(len(tokens))
+            self.unit_block.append(block)
+            self.unit_time.append(ts)
+
+            term_positions = {}
+            for i, token in enumerate(tokens):
+                if len(token) <= MAX_TOKEN_LENGTH:
+                    term_positions.setdefault(token, []).append(i)
+            # Filter terms only mark the unit: no frequency, no positions
+            term_positions.update(dict.fromkeys(tags, ()))
+
+            for term, pos in term_positions.items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = array('I')
+                    self.positions[term] = array('I')
+                postings.append(unit)
+                postings.append(len(pos))
+                self.positions[term].extend(pos)
+
+    def write(self, path):
+        """Write the segment to ``path`` + ``.meta`` / ``.cols`` / ``.post``."""
+        terms = sorted(self.postings)
+        term_offsets = array('Q')
+        term_counts = array('I')
+        term_npos = array('I')
+
+        offset = 0
+        with open(f"{path}.post", 'wb') as f:
+            for term in terms:
+                postings = self.postings[term]
+                positions = self.positions[term]
+                units = postings[0::2]
+                bounds = array('I', [0])
+                bounds.extend(itertools.accumulate(postings[1::2]))
+                term_offsets.append(offset)
+                term_counts.append(len(units))
+                term_npos.append(len(positions))
+                for values in (units, bounds, positions):
+                    f.write(values.tobytes())
+                offset += 2 * len(units) + 1 + len(positions)
+
+        # Trigrams of the words, not of the synthetic filter terms
+        grams = {}
+        for term_id, term in enumerate(terms):
+            if not term.startswith(':'):
+                for gram in term_grams(term):
+                    grams.setdefault(gram, []).append(term_id)
+        gram_ids = array('I')
+        gram_spans = {}
+        for gram, ids in grams.items():
+            gram_spans[gram] = [len(gram_ids), len(ids)]
+            gram_ids.extend(ids)
+
+        columns = {
+            'term_offsets': term_offsets,
+            'term_counts': term_counts,
+            'term_npos': term_npos,
+            'gram_ids': gram_ids,
+            'unit_conv': self.unit_conv,
+            'unit_msg': self.unit_msg,
+            'unit_field': self.unit_field,
+            'unit_len': self.unit_len,
+            'unit_block': self.unit_block,
+            'unit_time': self.unit_time,
+        }
+        with open(f"{path}.cols", 'wb') as f:
+            for values in columns.values():
+                values.tofile(f)
+        meta = {
+            'version': SEARCH_INDEX_VERSION,
+            'terms': terms,
+            'grams': gram_spans,
+            'conversations': self.conversations,
+            'columns': [[name, values.typecode, len(values)] for name, values in columns.items()],
+        }
+        with open(f"{path}.meta", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, separators=(',', ':'))
+
+
+class Segment:
+    """A read-only segment: term dictionary in memory, postings memory mapped."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(f"{path}.meta", 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != SEARCH_INDEX_VERSION:
+            raise ValueError(f"unsupported segment version in {path}")
+        self.terms = meta['terms']
+        self.grams = meta['grams']
+        self.conversations = meta['conversations']
+        with open(f"{path}.cols", 'rb') as f:
+            for name, typecode, length in meta['columns']:
+                values = array(typecode)
+                values.fromfile(f, length)
+                setattr(self, name, values)
+        with open(f"{path}.post", 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.terms else None
+        self.live = bytearray(len(self.conversations))
+
+    def _array(self, start, count):
+        values = array('I')
+        values.frombytes(self._map[start * 4:(start + count) * 4])
+        return values
+
+    def gram_terms(self, gram):
+        """Return the ids of the words containing a trigram."""
+        span = self.grams.get(gram)
+        if span is None:
+            return ()
+        return self.gram_ids[span[0]:span[0] + span[1]]
+
+    def term_id(self, term):
+        """Return the id of a term, or None if it is not in this segment."""
+        i = bisect.bisect_left(self.terms, term)
+        if i < len(self.terms) and self.terms[i] == term:
+            return i
+        return None
+
+    def expand_prefix(self, prefix):
+        """Return the ids of the terms starting with ``prefix``."""
+        start = bisect.bisect_left(self.terms, prefix)
+        ids = []
+        for i in range(start, min(start + MAX_PREFIX_EXPANSIONS, len(self.terms))):
+            if not self.terms[i].startswith(prefix):
+                break
+            ids.append(i)
+        return ids
+
+    def similar_terms(self, term, max_edits):
+        """Return ``(distance, term)`` for the words within ``max_edits`` edits of ``term``.
+
+        A word that close shares all but a few of its trigrams with ``term``
+        (an edit changes at most four). Words are compared most shared
+        trigrams first, and at most ``MAX_FUZZY_CANDIDATES`` of them.
+        """
+        grams = term_grams(term)
+        needed = max(1, len(grams) - 4 * max_edits)
+        counts = Counter()
+        for gram in grams:
+            counts.update(self.gram_terms(gram))
+
+        similar = []
+        checked = 0
+        for term_id, shared in counts.most_common():
+            if shared < needed or checked == MAX_FUZZY_CANDIDATES:
+                break
+            candidate = self.terms[term_id]
+            if abs(len(candidate) - len(term)) > max_edits:
+                continue
+            checked += 1
+            distance = edit_distance(term, candidate, max_edits)
+            if distance <= max_edits:
+                similar.append((distance, candidate))
+        return similar
+
+    def matching_terms(self, regex):
+        """Return the first ``MAX_PREFIX_EXPANSIONS`` words, in order, that a compiled regex finds.
+
+        Only words containing every trigram of the regex's required literals
+        are tried; without such literals every word is.
+        """
+        candidates = None
+        for literal in regex_literals(regex.pattern):
+            for i in range(len(literal) - 2):
+                ids = self.gram_terms(literal[i:i + 3])
+                candidates = set(ids) if candidates is None else candidates.intersection(ids)
+        terms = self.terms
+        matches = []
+        for i in sorted(candidates) if candidates is not None else range(len(terms)):
+            if regex.search(terms[i]) and not terms[i].startswith(':'):
+                matches.append(terms[i])
+                if len(matches) == MAX_PREFIX_EXPANSIONS:
+                    break
+        return matches
+
+    def units(self, term_id):
+        """Return the sorted units containing a term."""
+        return self._array(self.term_offsets[term_id], self.term_counts[term_id])
+
+    def postings(self, term_id):
+        """Return the sorted units containing a term and where each unit's positions start.
+
+        The bounds have one more entry than the units: the positions of
+        ``units[k]`` are ``bounds[k]:bounds[k + 1]``, so its term frequency
+        is the difference.
+        """
+        start = self.term_offsets[term_id]
+        n = self.term_counts[term_id]
+        return self._array(start, n), self._array(start + n, n + 1)
+
+    def positions(self, term_id):
+        """Return the token positions of a term, grouped by unit."""
+        n = self.term_counts[term_id]
+        return self._array(self.term_offsets[term_id] + 2 * n + 1, self.term_npos[term_id])
+
+    def size(self, clause):
+        """Return how many units a resolved clause can match at most, to order the clauses."""
+        kind, terms = clause
+        counts = [self.term_counts[i] if i is not None else 0 for i in map(self.term_id, terms)]
+        if kind == 'phrase':
+            return min(counts)
+        return sum(counts)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+
+
+class SearchIndex:
+    """Inverted index over all conversations, persisted next to the data."""
+
+    def __init__(self, index_dir):
+        self.index_dir = Path(index_dir)
+        self.manifest_path = self.index_dir / MANIFEST_FILENAME
+        self.segments = []
+        self.store = None
+        self.total_units = 0
+        self._cache = OrderedDict()  # query -> (ranked results, matched words)
+        self._cache_lock = threading.Lock()
+        self._generation = 0  # bumped by bind; results ranked before it are not cached
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def load(self, files):
+        """Load the saved segments if they were built from the same export files."""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') != SEARCH_INDEX_VERSION or not same_contents(manifest['files'], files):
+                return False
+            self.segments = [Segment(self.index_dir / name) for name in manifest['segments']]
+        except (OSError, ValueError, KeyError, EOFError):
+            return False
+        return True
+
+    def new_segment_prefix(self):
+        """Return a path prefix for new segment files, in a writable directory.
+
+        Prefixes are unique so new segments never overwrite files that a
+        running index still has mapped.
+        """
+        try:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            tempfile.TemporaryFile(dir=self.index_dir).close()
+        except OSError as e:
+            # Still serve searches when the data directory is read-only
+            print(f"  ⚠ Could not save search index to {self.index_dir}: {e}")
+            self.index_dir = Path(tempfile.mkdtemp(prefix='claude-explorer-'))
+            self.manifest_path = self.index_dir / MANIFEST_FILENAME
+        return self.index_dir / f"segment-{time.time_ns():x}-"
+
+    def indexed_versions(self):
+        """Return the ``(uuid, updated_at)`` of every conversation already indexed."""
+        return {tuple(entry) for seg in self.segments for entry in seg.conversations}
+
+    def clear(self):
+        """Forget all segments so the next update rebuilds the index.
+
+        The segments are not closed: a running index may still be reading them.
+        """
+        self.segments = []
+
+    def dead_fraction(self):
+        """Return the share of indexed conversations that are no longer current."""
+        total = sum(len(seg.live) for seg in self.segments)
+        if not total:
+            return 0.0
+        return 1 - sum(sum(seg.live) for seg in self.segments) / total
+
+    def update(self, paths, files, store):
+        """Add the segments written at ``paths``, bind to ``store`` and save the manifest.
+
+        Segments left with no current conversations are dropped and their
+        files removed.
+        """
+        self.segments = self.segments + [Segment(self.index_dir / Path(path).name) for path in paths]
+        self.bind(store)
+        live = [seg for seg in self.segments if any(seg.live)]
+        if len(live) < len(self.segments):
+            self.segments = live
+            self.bind(store)
+
+        names = [Path(seg.path).name for seg in self.segments]
+        manifest = {'version': SEARCH_INDEX_VERSION, 'files': files, 'segments': names}
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+        # Segments still mapped by an older index stay readable after unlinking
+        keep = {f"{name}{ext}" for name in names for ext in ('.meta', '.cols', '.post')}
+        for path in self.index_dir.glob('segment-*'):
+            if path.name not in keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def bind(self, store):
+        """Mark which indexed conversations are the current version in the store.
+
+        If a conversation was indexed more than once, only its last copy
+        counts. Also refreshes the collection statistics used for ranking.
+        """
+        self.store = store
+
+        holders = {}
+        for seg in self.segments:
+            seg.live = bytearray(len(seg.conversations))
+            for i, (uuid, updated_at) in enumerate(seg.conversations):
+                rec = store.records.get(uuid)
+                if rec is not None and rec.updated_at == updated_at:
+                    holders[uuid] = (seg, i)
+        for seg, i in holders.values():
+            seg.live[i] = 1
+
+        # Average unit length per field, for BM25 length normalization
+        totals = [0] * len(FIELDS)
+        counts = [0] * len(FIELDS)
+        for seg in self.segments:
+            for field, length in zip(seg.unit_field, seg.unit_len):
+                totals[field] += length
+                counts[field] += 1
+        avg_len = [totals[f] / counts[f] if counts[f] else 1.0 for f in range(len(FIELDS))]
+        for seg in self.segments:
+            seg.unit_norm = array('f', (
+                BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len[field])
+                for field, length in zip(seg.unit_field, seg.unit_len)))
+        self.total_units = sum(len(seg.unit_conv) for seg in self.segments)
+        with self._cache_lock:
+            self._cache.clear()
+            self._generation += 1
+
+    def _idf(self, term):
+        """Return the BM25 inverse document frequency of a term across all segments."""
+        df = 0
+        for seg in self.segments:
+            term_id = seg.term_id(term)
+            if term_id is not None:
+                df += seg.term_counts[term_id]
+        return math.log(1 + (self.total_units - df + 0.5) / (df + 0.5))
+
+    def _term_scores(self, seg, term, idf, units=None):
+        """Return ``{unit: BM25 score}`` for a term, optionally limited to some units."""
+        term_id = seg.term_id(term)
+        if term_id is None:
+            return {}
+        term_units, bounds = seg.postings(term_id)
+        norm = seg.unit_norm
+        weight = idf * (BM25_K1 + 1)
+        if units is None:
+            tfs = map(operator.sub, itertools.islice(bounds, 1, None), bounds)
+            return {unit: weight * tf / (tf + norm[unit]) for unit, tf in zip(term_units, tfs)}
+        if len(units) < len(term_units):
+            # Look the few units up rather than walk a long postings list
+            picks = []
+            for unit in units:
+                k = bisect.bisect_left(term_units, unit)
+                if k < len(term_units) and term_units[k] == unit:
+                    picks.append(k)
+        else:
+            picks = [k for k, unit in enumerate(term_units) if unit in units]
+
+        scores = {}
+        for k in picks:
+            unit = term_units[k]
+            tf = bounds[k + 1] - bounds[k]
+            scores[unit] = weight * tf / (tf + norm[unit])
+        return scores
+
+    def _phrase_units(self, seg, terms, units=None):
+        """Return the units in which ``terms`` appear next to each other, in order.
+
+        Candidates are the units containing every term, or ``units`` when
+        given, and each is checked one term at a time, rarest first, stopping
+        at the first term that doesn't line up.
+        """
+        term_ids = [seg.term_id(term) for term in terms]
+        if None in term_ids:
+            return set()
+        order = sorted(range(len(terms)), key=lambda i: seg.term_counts[term_ids[i]])
+        lists = {}
+        for i in order:
+            term_units, bounds = seg.postings(term_ids[i])
+            where = dict(zip(term_units, range(len(term_units))))
+            lists[i] = (where, bounds, seg.positions(term_ids[i]))
+
+        if units is None:
+            units = set(lists[order[0]][0])
+            for i in order[1:]:
+                units.intersection_update(lists[i][0])
+        matches = set()
+        for unit in units:
+            starts = None
+            for i in order:
+                where, bounds, positions = lists[i]
+                k = where.get(unit)
+                if k is None:
+                    break
+                # Where the phrase would start for each occurrence of this term
+                shifted = positions[bounds[k]:bounds[k + 1]]
+                if i:
+                    shifted = map(operator.sub, shifted, itertools.repeat(i))
+                starts = set(shifted) if starts is None else starts.intersection(shifted)
+                if not starts:
+                    break
+            else:
+                matches.add(unit)
+        return matches
+
+    def _clause_scores(self, seg, clause, idf, units=None):
+        """Return ``{unit: score}`` for the units in a segment that satisfy one clause.
+
+        ``units`` limits the result to units already matched by other clauses.
+        """
+        kind, terms = clause
+        scores = {}
+        if kind == 'any':
+            for term in terms:
+                for unit, score in self._term_scores(seg, term, idf[term], units).items():
+                    scores[unit] = scores.get(unit, 0.0) + score
+            return scores
+
+        matches = self._phrase_units(seg, terms, units)
+        if not matches:
+            return scores
+        for term in set(terms):
+            for unit, score in self._term_scores(seg, term, idf[term], matches).items():
+                scores[unit] = scores.get(unit, 0.0) + score
+        return scores
+
+    def _filter_units(self, seg, filters, units=None):
+        """Return ``{unit: score}`` for the units that pass every filter.
+
+        ``units`` are the scored units matching the query words, or None to
+        start from every unit in the segment with a score of 0.
+        """
+        tagged = {}
+        fields = None
+        after = None
+        before = None
+        for kind, value in filters:
+            if kind in TAG_FILTERS:
+                term_id = seg.term_id(value)
+                tagged.setdefault(kind, set()).update(seg.units(term_id) if term_id is not None else ())
+            elif kind == 'in':
+                fields = (fields or set()) | set(value)
+            elif kind == 'after':
+                after = value if after is None else max(after, value)
+            else:
+                before = value if before is None else min(before, value)
+
+        checks = []  # (column, test) pairs each candidate unit must pass
+        if fields is not None:
+            checks.append((seg.unit_field, fields.__contains__))
+        if after is not None:
+            checks.append((seg.unit_time, after.__le__))
+        if before is not None:
+            checks.append((seg.unit_time, before.__gt__))
+
+        candidates = units
+        for matching in sorted(tagged.values(), key=len):
+            candidates = matching if candidates is None else list(filter(matching.__contains__, candidates))
+        every = candidates is None
+        if every:
+            candidates = range(len(seg.unit_conv))
+        # Test whole columns with C-level iterators rather than unit by unit
+        for column, test in checks:
+            values = column if every else map(column.__getitem__, candidates)
+            candidates = list(itertools.compress(candidates, map(test, values)))
+            every = False
+
+        if units is None:
+            return dict.fromkeys(candidates, 0.0)
+        return {unit: units[unit] for unit in candidates}
+
+    def _has_term(self, term):
+        """Return True if any segment contains ``term``."""
+        return any(seg.term_id(term) is not None for seg in self.segments)
+
+    def _similar(self, term):
+        """Return the indexed words closest to ``term``, nearest first."""
+        max_edits = fuzzy_edits(term)
+        if not max_edits:
+            return [term]
+        similar = set()
+        for seg in self.segments:
+            similar.update(seg.similar_terms(term, max_edits))
+        return [t for _, t in sorted(similar)[:MAX_FUZZY_EXPANSIONS]]
+
+    def _resolve(self, clauses):
+        """Expand prefix, fuzzy and regex clauses into concrete terms present in the index.
+
+        A term or prefix with no match at all is treated as a typo and
+        expanded fuzzily.
+        """
+        resolved = []
+        for kind, value in clauses:
+            if kind == 'term':
+                resolved.append(('any', [value] if self._has_term(value) else self._similar(value)))
+            elif kind == 'prefix':
+                terms = set()
+                for seg in self.segments:
+                    terms.update(seg.terms[i] for i in seg.expand_prefix(value))
+                resolved.append(('any', sorted(terms)[:MAX_PREFIX_EXPANSIONS] or self._similar(value)))
+            elif kind == 'fuzzy':
+                resolved.append(('any', self._similar(value)))
+            elif kind == 'regex':
+                terms = set()
+                for seg in self.segments:
+                    terms.update(seg.matching_terms(value))
+                resolved.append(('any', sorted(terms)[:MAX_PREFIX_EXPANSIONS]))
+            else:
+                resolved.append(('phrase', value))
+        return resolved
+
+    def rank(self, query):
+        """Return every conversation matching a query, best first.
+
+        Each result is ``(score, created_at, uuid, hits)``, where ``hits``
+        lists the best matching units as ``(score, field, message_index,
+        block)``. A conversation scores its best unit plus a fraction of the
+        others. A query made only of filters matches every unit passing them,
+        newest conversation first.
+        """
+        return self._ranked(query)[0]
+
+    def matched_terms(self, query):
+        """Return the set of indexed words a query matched, for highlighting."""
+        return self._ranked(query, count=False)[1]
+
+    def _ranked(self, query, count=True):
+        """Return ``(results, matched words)`` for a query, from the cache when possible.
+
+        ``count`` says whether the lookup counts towards the cache statistics.
+        """
+        with self._cache_lock:
+            cached = self._cache.get(query)
+            if cached is not None:
+                self._cache.move_to_end(query)
+                self.cache_hits += count
+                return cached
+            self.cache_misses += count
+            generation = self._generation
+
+        clauses = parse_query(query)
+        filters = [c for c in clauses if c[0] not in WORD_CLAUSES]
+        resolved = self._resolve([c for c in clauses if c[0] in WORD_CLAUSES])
+        idf = {}
+        for kind, terms in resolved:
+            for term in terms:
+                if term not in idf:
+                    idf[term] = self._idf(term)
+
+        conv_hits = {}
+        for seg in self.segments if resolved or filters else ():
+            # Rarest clause first; the others only check the units it matched
+            units = None
+            for clause in sorted(resolved, key=seg.size):
+                scores = self._clause_scores(seg, clause, idf, units)
+                if units is None:
+                    units = scores
+                else:
+                    units = {u: s + scores[u] for u, s in units.items() if u in scores}
+                if not units:
+                    break
+            if filters and (units or not resolved):
+                units = self._filter_units(seg, filters, units)
+            for unit, score in (units or {}).items():
+                conv_id = seg.unit_conv[unit]
+                if seg.live[conv_id]:
+                    field = seg.unit_field[unit]
+                    uuid = seg.conversations[conv_id][0]
+                    hit = (score * FIELD_WEIGHTS[field], field, seg.unit_msg[unit], seg.unit_block[unit])
+                    conv_hits.setdefault(uuid, []).append(hit)
+
+        results = []
+        for uuid, hits in conv_hits.items():
+            hits.sort(reverse=True)
+            score = hits[0][0] + OTHER_HITS_WEIGHT * sum(h[0] for h in hits[1:])
+            created_at = self.store.records[uuid].created_at
+            results.append((score, created_at, uuid, hits[:MAX_HITS_PER_RESULT]))
+        results.sort(key=lambda r: r[:3], reverse=True)
+
+        entry = (results, {term for kind, terms in resolved for term in terms})
+        with self._cache_lock:
+            if generation == self._generation:
+                self._cache[query] = entry
+                if len(self._cache) > RANK_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return entry
+
+    def search(self, query, cursor=None, limit=20):
+        """Return one page of ranked results as ``(page, total, next_cursor)``.
+
+        ``cursor`` is the opaque value returned for the previous page. It
+        records the last result's sort key. Paging resumes after that
+        conversation while it is still a result, so results added before it
+        by a reload don't repeat earlier pages; scores shift when the
+        collection changes, so the key itself is only the fallback.
+        """
+        results = self.rank(query)
+        start = 0
+        if cursor:
+            after = decode_cursor(cursor)
+            start = next((i + 1 for i, r in enumerate(results) if r[2] == after[2]), None)
+            if start is None:
+                start = 0
+                while start < len(results) and list(results[start][:3]) >= after:
+                    start += 1
+        page = results[start:start + limit]
+        next_cursor = None
+        if start + limit < len(results):
+            next_cursor = encode_cursor(page[-1][:3])
+        return page, len(results), next_cursor
+
+    def close(self):
+        for seg in self.segments:
+            seg.close()
+        self.segments = []
+
+
+def encode_cursor(key):
+    """Encode a result sort key as an opaque pagination cursor."""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decode a pagination cursor. Raises ValueError if it is malformed."""
+    try:
+        score, created_at, uuid = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return [float(score), int(created_at), str(uuid)]
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
+
+
+def make_snippet(text, matches, length=SNIPPET_LENGTH):
+    """Cut a snippet around the first matching token in ``text``.
+
+    Returns ``{'snippet', 'offset', 'highlights'}`` where ``offset`` is the
+    snippet's character offset in ``text`` and ``highlights`` are
+    ``[start, end]`` character ranges within the snippet.
+    """
+    spans = [m.span() for m in TOKEN_RE.finditer(text) if matches(m.group().lower())]
+    start = 0
+    if spans and spans[0][1] > length:
+        start = max(0, spans[0][0] - SNIPPET_CONTEXT)
+        # Start on a word boundary
+        space = text.find(' ', start, spans[0][0])
+        if space != -1:
+            start = space + 1
+    end = min(len(text), start + length)
+    return {
+        'snippet': text[start:end],
+        'offset': start,
+        'highlights': [[s - start, e - start] for s, e in spans if s >= start and e <= end],
+    }
+
+
+def hit_snippets(conv, hits, terms):
+    """Build snippets for the best matching units of a conversation, highlighting ``terms``.
+
+    Hits in a tool call or result name the tool; hits in an attachment name
+    the file.
+    """
+    matches = terms.__contains__
+    messages = conv.get('chat_messages') or []
+    names = tool_names(messages)
+    snippets = []
+    for score, field, msg_index, block in hits:
+        hit = {'field': FIELDS[field]}
+        if field == FIELD_NAME or field == FIELD_SUMMARY:
+            text = conv.get(FIELDS[field]) or ''
+        else:
+            if msg_index >= len(messages):
+                continue
+            msg = messages[msg_index]
+            hit['message_uuid'] = msg.get('uuid', '')
+            hit['message_index'] = msg_index
+            hit['sender'] = msg.get('sender', 'unknown')
+            text = next((text for unit_field, unit_block, text, tags in message_units(msg, names)
+                         if unit_field == field and unit_block == block), '')
+            if field == FIELD_ATTACHMENT:
+                hit['file_name'] = msg['attachments'][block].get('file_name') or ''
+            elif field != FIELD_MESSAGE:
+                item = msg['content'][block]
+                hit['tool'] = item.get('name') or names.get(item.get('tool_use_id'), '')
+        hit.update(make_snippet(text, matches))
+        snippets.append(hit)
+    return snippets
@@ -4,95 +4,587 @@ Claude Conversation Explorer - Server
 Serves Claude conversation data as a browsable web interface.
 """
 
+import gzip
+import hashlib
 import json
 import os
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import selectors
+import socket
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 import urllib.parse
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import export
+import metrics
+from search_index import SearchIndex, SegmentBuilder, hit_snippets, parse_date
+from stats import Rollups
+from store import ConversationStore, StaleRecordError, file_signature, source_files
+
 # Configuration
 DATA_DIR = Path("/Users/abhissrivasta/Downloads/279-Abhishek-bitsabhi-claude-account")
 PORT = 8888
+MAX_WORKERS = 16          # requests served at once
+KEEP_ALIVE_TIMEOUT = 15   # seconds an idle keep-alive connection stays open
+MIN_COMPRESS_SIZE = 1024  # smaller responses are sent uncompressed
+INGEST_WORKERS = os.cpu_count() or 1  # processes parsing export files in parallel
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+RESPONSE_CACHE_BYTES = 64 * 1024 * 1024  # serialized conversation responses kept in memory
+STREAM_THRESHOLD = 1024 * 1024  # larger responses are streamed with chunked encoding, not cached
+STREAM_CHUNK_SIZE = 64 * 1024  # bytes per chunk of a streamed response
+MAX_POST_BYTES = 16 * 1024 * 1024  # largest form accepted by POST /api/export
+
+INDEX_DIR = DATA_DIR / ".claude-explorer"
+COMPACT_DEAD_FRACTION = 0.5  # rebuild the search index once this much of it is stale
+WATCH_INTERVAL = 2  # seconds between checks of DATA_DIR for new or changed exports
+
+# Opt-in profiling: requests slower than this many seconds have their sampled
+# stacks written to INDEX_DIR/profiles (None to disable)
+PROFILE_SLOW_REQUESTS = None
+PROFILE_INTERVAL = 0.005  # seconds between stack samples while profiling
+
+# On-disk conversation store, search index and stats rollups, opened on first use
+store = None
+search_index = None
+rollups = None
+
+# Serialized conversation list, rebuilt only when the store changes
+_list_response = None
+
+# Sampling profiler, started by main() when PROFILE_SLOW_REQUESTS is set
+profiler = None
+
+_load_lock = threading.Lock()
+
+
+class ResponseCache:
+    """LRU of serialized responses, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for ``key``, or None."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, size):
+        """Cache ``value``, evicting the least recently used entries to stay under the bound."""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+
+    def stats(self):
+        """Return the cache's counters."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
 
-# Cache loaded conversations
-conversations_cache = {}
 
-def load_conversations():
-    """Load all conversation files."""
-    global conversations_cache
+# Conversation responses by (uuid, updated_at, window); each entry maps an
+# encoding (None for identity) to the body sent with it
+conversation_responses = ResponseCache(RESPONSE_CACHE_BYTES)
+
+# Metrics, served at /api/metrics
+ROUTES = ('/', '/api/conversations', '/api/conversation', '/api/search', '/api/stats', '/api/export',
+          '/api/metrics')
+REQUEST_SECONDS = metrics.histogram(
+    'explorer_request_duration_seconds', 'Time to serve a request, by route.', ['route'])
+REQUESTS = metrics.counter(
+    'explorer_requests_total', 'Requests served, by route and status code.', ['route', 'status'])
+REQUESTS_IN_FLIGHT = metrics.gauge('explorer_requests_in_flight', 'Requests being served.')
+LOAD_SECONDS = metrics.gauge(
+    'explorer_load_duration_seconds', 'Duration of each stage of the last load of the export files.', ['stage'])
+LOADS = metrics.counter('explorer_loads_total', 'Loads of the export files, by result.', ['result'])
+EXPORTED = metrics.counter(
+    'explorer_exported_conversations_total', 'Conversations sent by /api/export, by format.', ['format'])
+metrics.gauge('explorer_conversations', 'Conversations in the store.',
+              collect=lambda: len(store) if store is not None else None)
+metrics.gauge('explorer_conversation_bytes', 'Bytes of conversation JSON in the export files, read on demand.',
+              collect=lambda: sum(rec.length for rec in store.records.values()) if store is not None else None)
+metrics.gauge('explorer_search_segments', 'Segments in the search index.',
+              collect=lambda: len(search_index.segments) if search_index is not None else None)
+metrics.gauge('explorer_search_dead_fraction', 'Share of the search index holding stale conversations.',
+              collect=lambda: search_index.dead_fraction() if search_index is not None else None)
+metrics.counter('explorer_search_cache_hits_total', 'Searches answered from the ranked results cache.',
+                collect=lambda: search_index.cache_hits if search_index is not None else None)
+metrics.counter('explorer_search_cache_misses_total', 'Searches that had to be ranked.',
+                collect=lambda: search_index.cache_misses if search_index is not None else None)
+metrics.counter('explorer_response_cache_hits_total', 'Conversation responses served from the cache.',
+                collect=lambda: conversation_responses.stats()['hits'])
+metrics.counter('explorer_response_cache_misses_total', 'Conversation responses that had to be built.',
+                collect=lambda: conversation_responses.stats()['misses'])
+metrics.counter('explorer_response_cache_evictions_total', 'Conversation responses evicted from the cache.',
+                collect=lambda: conversation_responses.stats()['evictions'])
+metrics.gauge('explorer_response_cache_entries', 'Conversation responses in the cache.',
+              collect=lambda: conversation_responses.stats()['entries'])
+metrics.gauge('explorer_response_cache_bytes', 'Bytes of conversation responses in the cache.',
+              collect=lambda: conversation_responses.stats()['bytes'])
+metrics.counter('explorer_profiles_written_total', 'Slow request profiles written.',
+                collect=lambda: profiler.dumps if profiler is not None else None)
 
-    if conversations_cache:
-        return conversations_cache
 
-    all_conversations = []
+def load_conversations():
+    """Open the conversation store and search index, building them if needed."""
+    if store is not None:
+        return store
+
+    with _load_lock:
+        if store is None:
+            publish(*open_indexes())
+    return store
+
+
+def open_indexes():
+    """Open the store, search index and stats, updating them for export files that changed.
+
+    The duration of each stage is printed and kept for /api/metrics.
+    """
+    started = stage_start = time.perf_counter()
+    timings = {}
+
+    def finish(stage):
+        nonlocal stage_start
+        now = time.perf_counter()
+        timings[stage] = now - stage_start
+        stage_start = now
+
+    convs = ConversationStore(DATA_DIR, INDEX_DIR)
+    index = SearchIndex(INDEX_DIR / "search")
+
+    if not (convs.load_index() and index.load(convs.files)):
+        # Without both saved indexes nothing can be reused
+        convs.clear()
+        index.clear()
+    finish('open')
+
+    # One parallel pass over the changed files updates the store and writes a
+    # search segment per file holding only conversations not indexed yet
+    segments = convs.refresh(INGEST_WORKERS, SegmentBuilder, index.new_segment_prefix(),
+                             skip=index.indexed_versions())
+    finish('parse')
+    timings['compact'] = 0.0
+    if segments is not None:
+        index.update(segments, convs.files, convs)
+        finish('search_index')
+        print(f"  ✓ Search index updated with {len(segments)} segments")
+        if index.dead_fraction() > COMPACT_DEAD_FRACTION:
+            print("  Compacting search index...")
+            index.clear()
+            segments = convs.ingest(INGEST_WORKERS, SegmentBuilder, index.new_segment_prefix())
+            index.update(segments, convs.files, convs)
+            finish('compact')
+    else:
+        index.bind(convs)
+        finish('search_index')
+
+    # Recount only conversations that differ from the last load
+    stats = (rollups or Rollups()).updated(convs.records)
+    finish('stats')
+
+    timings['total'] = time.perf_counter() - started
+    for stage, seconds in timings.items():
+        LOAD_SECONDS.set(seconds, stage=stage)
+    LOADS.inc(result='ok')
+    print(f"  ✓ Loaded in {timings['total']:.2f}s (open {timings['open']:.2f}s, parse {timings['parse']:.2f}s, "
+          f"search index {timings['search_index']:.2f}s, compact {timings['compact']:.2f}s, "
+          f"stats {timings['stats']:.2f}s)")
+    return convs, index, stats
+
+
+def publish(convs, index, stats):
+    """Swap in a fully built store, search index and stats.
+
+    Requests already running keep the objects they started with; the old
+    ones are released once the last of them finishes.
+    """
+    global store, search_index, rollups
+
+    # Publish the store last: readers check `store` without the lock
+    search_index = index
+    rollups = stats
+    store = convs
+
+    print(f"\nTotal: {len(store)} conversations indexed")
+
+
+def data_signature():
+    """Return the name, size and mtime of each export file, to notice changes cheaply."""
+    return [(path.name, *file_signature(path).values()) for path in source_files(DATA_DIR)]
+
+
+def poll_data_signature():
+    """Return ``data_signature()``, or None if a file vanished or was replaced while checking it."""
+    try:
+        return data_signature()
+    except OSError as e:
+        print(f"  ⚠ Could not check export files: {e}")
+        return None
+
+
+def watch_data_dir(stop):
+    """Reload the conversations in the background whenever the export files change.
+
+    Polls ``DATA_DIR`` every ``WATCH_INTERVAL`` seconds until ``stop`` is set.
+    A change is only picked up once the files have stopped changing, so a
+    copy in progress is not read half written.
+    """
+    seen = poll_data_signature()
+    while not stop.wait(WATCH_INTERVAL):
+        current = poll_data_signature()
+        if current is None or current == seen:
+            continue
+        while not stop.wait(WATCH_INTERVAL):
+            settled = poll_data_signature()
+            if settled is not None and settled == current:
+                break
+            current = settled
+        else:
+            return
+        seen = current
+        print("\n🔄 Export files changed, reloading...")
+        try:
+            with _load_lock:
+                publish(*open_indexes())
+        except Exception as e:
+            # Keep serving the last good index
+            LOADS.inc(result='failed')
+            print(f"  ✗ Reload failed: {e}")
+
+
+def get_search_index():
+    """Get the search index, loading it with the conversations."""
+    load_conversations()
+    return search_index
+
 
-    for i in range(1, 5):
-        filepath = DATA_DIR / f"conversations {i}.json"
-        if filepath.exists():
-            print(f"Loading {filepath.name}...")
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    # Try to parse, handle potential issues
-                    try:
-                        data = json.loads(content)
-                        if isinstance(data, list):
-                            all_conversations.extend(data)
-                        else:
-                            all_conversations.append(data)
-                        print(f"  ✓ Loaded {len(data) if isinstance(data, list) else 1} conversations")
-                    except json.JSONDecodeError as e:
-                        print(f"  ⚠ JSON error in {filepath.name}: {e}")
-                        # Try to salvage what we can
-                        try:
-                            # Sometimes the JSON is cut off - try to find valid objects
-                            content = content.strip()
-                            if content.startswith('['):
-                                # Try removing last incomplete item
-                                last_complete = content.rfind('},')
-                                if last_complete > 0:
-                                    fixed = content[:last_complete+1] + ']'
-                                    data = json.loads(fixed)
-                                    all_conversations.extend(data)
-                                    print(f"  ✓ Recovered {len(data)} conversations")
-                        except:
-                            print(f"  ✗ Could not recover {filepath.name}")
-            except Exception as e:
-                print(f"  ✗ Error loading {filepath.name}: {e}")
-
-    # Build index by UUID
-    for conv in all_conversations:
-        if 'uuid' in conv:
-            conversations_cache[conv['uuid']] = conv
-
-    print(f"\nTotal: {len(conversations_cache)} conversations loaded")
-    return conversations_cache
+def get_rollups():
+    """Get the stats rollups, loading them with the conversations."""
+    load_conversations()
+    return rollups
+
+
+def select_conversations(ids=(), query=None, after=None, before=None):
+    """Pick conversations for an export; returns ``(store, records)``.
+
+    ``ids`` keep their order and ``query`` takes every conversation it
+    matches, best first; with neither, every conversation is taken in the
+    order it is stored in the export files, so they are read sequentially.
+    ``after`` (inclusive) and ``before`` (exclusive) then filter on when
+    each was started, in microseconds. Unknown ids are skipped.
+    """
+    index = get_search_index()
+    convs = index.store  # the store this index was built for, even mid-reload
+    if query:
+        records = [convs.records[uuid] for score, created_at, uuid, hits in index.rank(query)]
+    elif ids:
+        records = [convs.records[uuid] for uuid in dict.fromkeys(ids) if uuid in convs.records]
+    else:
+        records = sorted(convs.records.values(), key=lambda rec: (rec.file, rec.offset))
+    if ids and query:
+        wanted = set(ids)
+        records = [rec for rec in records if rec.uuid in wanted]
+    if after is not None or before is not None:
+        records = [rec for rec in records if (after is None or rec.created_at >= after)
+                   and (before is None or rec.created_at < before)]
+    return convs, records
 
 
 def get_conversation_list():
     """Get list of all conversations with metadata."""
-    convs = load_conversations()
+    return load_conversations().list()
 
-    result = []
-    for uuid, conv in convs.items():
-        result.append({
-            'uuid': uuid,
-            'name': conv.get('name', 'Untitled'),
-            'summary': conv.get('summary', ''),
-            'created_at': conv.get('created_at', ''),
-            'updated_at': conv.get('updated_at', ''),
-            'message_count': len(conv.get('chat_messages', []))
-        })
 
-    # Sort by created_at descending (newest first)
-    result.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-    return result
+def get_conversation_list_response():
+    """Get the conversation list as cached JSON bytes with an ETag."""
+    global _list_response
+
+    convs = load_conversations()
+    # Compare the store itself: a reloaded store can reuse a freed one's id and generation
+    if (_list_response is None or _list_response['store'] is not convs
+            or _list_response['generation'] != convs.generation):
+        # One conversation at a time, so the list never also exists as one big string
+        body = b''.join(piece.encode('utf-8') for piece in iter_json(iter(get_conversation_list())))
+        _list_response = {
+            'store': convs,
+            'generation': convs.generation,
+            'etag': hashlib.sha1(body).hexdigest(),
+            'body': body,
+            'encoded': {None: body},  # compressed copies, made on first request
+        }
+    return _list_response
+
+
+def iter_json(value):
+    """Yield ``value`` as JSON text in pieces, formatted like ``json.dumps``.
+
+    Iterators (e.g. generators), also as the values of a dict, become arrays
+    encoded one item at a time, so a large result is never held as a single
+    string.
+    """
+    if isinstance(value, dict):
+        sep = '{'
+        for key, item in value.items():
+            yield f'{sep}{json.dumps(key)}: '
+            if isinstance(item, Iterator):
+                yield from iter_json(item)
+            else:
+                yield json.dumps(item)
+            sep = ', '
+        yield '}' if sep == ', ' else '{}'
+    elif isinstance(value, Iterator):
+        sep = '['
+        for item in value:
+            yield sep + json.dumps(item)
+            sep = ', '
+        yield ']' if sep == ', ' else '[]'
+    else:
+        yield json.dumps(value)
+
+
+class ChunkedWriter:
+    """Writes a response body as it is produced, compressing it on the fly.
+
+    Uses chunked transfer encoding for HTTP/1.1 clients. For HTTP/1.0 the
+    body is written as is and ends when the connection closes.
+    """
+
+    def __init__(self, wfile, encoding=None, chunked=True):
+        self.wfile = wfile
+        self.chunked = chunked
+        self._buffer = bytearray()
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=5)
+            self._compress, self._finish = compressor.process, compressor.finish
+        elif encoding == 'gzip':
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._compress, self._finish = compressor.compress, compressor.flush
+        else:
+            self._compress = self._finish = None
+
+    def write(self, data):
+        """Buffer data to send; returns its length, like a file's ``write``."""
+        size = len(data)
+        if self._compress is not None:
+            data = self._compress(data)
+        self._buffer += data
+        if len(self._buffer) >= STREAM_CHUNK_SIZE:
+            self._send()
+        return size
+
+    def flush(self):
+        """Send what has been buffered so far (without flushing the compressor)."""
+        self._send()
+
+    def _send(self):
+        if not self._buffer:
+            return
+        if self.chunked:
+            self.wfile.write(b'%x\r\n' % len(self._buffer))
+            self._buffer += b'\r\n'
+        self.wfile.write(self._buffer)
+        self._buffer.clear()
+
+    def close(self):
+        """Write out the rest of the body and, when chunked, the terminating chunk."""
+        if self._finish is not None:
+            self._buffer += self._finish()
+        self._send()
+        if self.chunked:
+            self.wfile.write(b'0\r\n\r\n')
+
+
+def choose_encoding(accept_encoding):
+    """Pick the best compression the client accepts, or None."""
+    if brotli is not None and accepts_encoding(accept_encoding, 'br'):
+        return 'br'
+    if accepts_encoding(accept_encoding, 'gzip'):
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    """Compress a response body for on-the-fly serving."""
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def parse_range(header, size):
+    """Parse a single-range ``Range: bytes=...`` header.
+
+    Returns ``(start, end)`` with an inclusive end, None if the header should
+    be ignored (absent, malformed or multi-range), or raises ValueError if the
+    range can't be satisfied.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, sep, last = header[len('bytes='):].strip().partition('-')
+    if not sep:
+        return None
+    try:
+        start = int(first) if first else None
+        end = int(last) if last else None
+    except ValueError:
+        return None
+    if (start is None and end is None) or min(start or 0, end or 0) < 0:
+        return None
+    if start is not None and end is not None and end < start:
+        return None
+    if start is None:
+        # Suffix range: the last `end` bytes
+        if end == 0:
+            raise ValueError('range not satisfiable')
+        start, end = max(0, size - end), size - 1
+    elif end is None or end >= size:
+        end = size - 1
+    if start >= size:
+        raise ValueError('range not satisfiable')
+    return start, end
+
+
+class FileSlice:
+    """Read-only view of part of a file, so copyfile() sends only a range."""
+
+    def __init__(self, f, start, length):
+        f.seek(start)
+        self.f = f
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.f.close()
+
+
+def accepts_encoding(header, encoding):
+    """Check whether an Accept-Encoding header allows the given encoding."""
+    for part in (header or '').split(','):
+        name, *params = part.split(';')
+        if name.strip().lower() not in (encoding, '*'):
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        return q > 0
+    return False
 
 
 def get_conversation(uuid):
     """Get a single conversation by UUID."""
-    convs = load_conversations()
-    return convs.get(uuid)
+    return load_conversations().get(uuid)
+
+
+def get_conversation_window(uuid, offset=0, limit=None, around=None):
+    """Get a conversation with a window of its messages formatted for display.
+
+    ``messages`` is a generator; serialize the result with ``iter_json()``.
+
+    ``around`` is a message UUID; when given, the window is centred on it.
+    Without a ``limit`` every message from ``offset`` on is returned.
+    """
+    conv = get_conversation(uuid)
+    if not conv:
+        return None
+
+    chat_messages = conv.get('chat_messages', [])
+    total = len(chat_messages)
+
+    if around:
+        for i, msg in enumerate(chat_messages):
+            if msg.get('uuid') == around:
+                window = limit or total
+                offset = min(i - window // 2, total - window)
+                break
+    offset = min(max(offset, 0), total)
+    end = total if limit is None else min(offset + limit, total)
+
+    # Messages are formatted lazily, as iter_json() writes them out
+    return {
+        'uuid': conv.get('uuid', ''),
+        'name': conv.get('name', 'Untitled'),
+        'summary': conv.get('summary', ''),
+        'created_at': conv.get('created_at', ''),
+        'updated_at': conv.get('updated_at', ''),
+        'message_count': total,
+        'offset': offset,
+        'next_offset': end if end < total else None,
+        'messages': (format_message(msg) for msg in chat_messages[offset:end])
+    }
+
+
+def int_param(query, name, default):
+    """Read a non-negative integer query parameter."""
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise ValueError(f'Invalid {name}')
+    return value
+
+
+def format_message(msg):
+    """Format a message for display."""
+    return {
+        'uuid': msg.get('uuid', ''),
+        'sender': msg.get('sender', 'unknown'),
+        'created_at': msg.get('created_at', ''),
+        'content': format_message_content(msg),
+        'attachments': msg.get('attachments', []),
+        'files': msg.get('files', [])
+    }
 
 
 def format_message_content(msg):
@@ -120,129 +612,551 @@ def format_message_content(msg):
     return '\n'.join(content_parts)
 
 
+class ExplorerServer(ThreadingHTTPServer):
+    """HTTP server that serves requests from a bounded pool of worker threads.
+
+    The accept loop only hands sockets to the pool, so a slow search or a
+    large conversation never blocks other tabs or static files. Between
+    requests a keep-alive connection waits in a selector rather than on a
+    worker, so idle tabs and scrapers can't use up the pool.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, server_address, handler_class, max_workers=MAX_WORKERS):
+        super().__init__(server_address, handler_class)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='explorer')
+        self.idle = selectors.DefaultSelector()
+        self._idle_lock = threading.Lock()
+        self._idle_closed = False
+        # Written to when a connection is parked, so the selector picks it up at once
+        self._wake_recv, self._wake_send = socket.socketpair()
+        self._wake_recv.setblocking(False)
+        self.idle.register(self._wake_recv, selectors.EVENT_READ)
+        threading.Thread(target=self.watch_idle, name='explorer-idle', daemon=True).start()
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.serve_connection, request, client_address)
+
+    def serve_connection(self, request, client_address, handler=None):
+        """Serve the waiting requests of a connection; close it unless its handler parked it."""
+        try:
+            if handler is None:
+                handler = self.RequestHandlerClass(request, client_address, self)
+            else:
+                handler.resume()
+            if not handler.close_connection:
+                return
+        except Exception:
+            self.handle_error(request, client_address)
+        self.shutdown_request(request)
+
+    def park(self, handler):
+        """Hold a kept-alive connection until its next request arrives.
+
+        Returns False if the server is closing and the connection should be
+        closed instead.
+        """
+        with self._idle_lock:
+            if self._idle_closed:
+                return False
+            self.idle.register(handler.connection, selectors.EVENT_READ, (handler, time.monotonic()))
+        self._wake_send.send(b'\0')
+        return True
+
+    def watch_idle(self):
+        """Hand parked connections back to the pool once readable; close those idle too long."""
+        while True:
+            events = self.idle.select(timeout=1)
+            expired = []
+            with self._idle_lock:
+                if self._idle_closed:
+                    break
+                for key, mask in events:
+                    if key.fileobj is self._wake_recv:
+                        try:
+                            self._wake_recv.recv(4096)
+                        except BlockingIOError:
+                            pass
+                        continue
+                    self.idle.unregister(key.fileobj)
+                    handler = key.data[0]
+                    try:
+                        self.pool.submit(self.serve_connection, handler.request, handler.client_address, handler)
+                    except RuntimeError:
+                        # The pool was shut down, e.g. as the interpreter exits
+                        expired.append(handler)
+                deadline = time.monotonic() - KEEP_ALIVE_TIMEOUT
+                for key in list(self.idle.get_map().values()):
+                    if key.data is not None and key.data[1] < deadline:
+                        self.idle.unregister(key.fileobj)
+                        expired.append(key.data[0])
+            for handler in expired:
+                self.close_parked(handler)
+
+        for key in list(self.idle.get_map().values()):
+            if key.data is not None:
+                self.close_parked(key.data[0])
+        self.idle.close()
+        self._wake_recv.close()
+        self._wake_send.close()
+
+    def close_parked(self, handler):
+        """Close a connection that was waiting for its next request."""
+        handler.close_connection = True
+        handler.finish()
+        self.shutdown_request(handler.request)
+
+    def server_close(self):
+        super().server_close()
+        with self._idle_lock:
+            self._idle_closed = True
+        self._wake_send.send(b'\0')
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
 class ConversationHandler(SimpleHTTPRequestHandler):
     """HTTP handler for conversation explorer."""
 
+    # Keep-alive: every response below sends a Content-Length or is chunked
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEP_ALIVE_TIMEOUT
+    # Headers and body are separate writes; without this the body waits for
+    # the client's delayed ACK of the headers on a reused connection
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        """Serve requests until the connection closes or has none waiting.
+
+        A connection kept alive with nothing more to read is then parked with
+        the server (see ``finish``), freeing this worker until it is readable.
+        """
+        self.close_connection = True
+        try:
+            self.handle_one_request()
+            while not self.close_connection and self.request_pending():
+                self.handle_one_request()
+        except BaseException:
+            self.close_connection = True
+            raise
+
+    def resume(self):
+        """Serve a parked connection that has become readable."""
+        try:
+            self.handle()
+        finally:
+            self.finish()
+
+    def request_pending(self):
+        """Check without blocking whether the client has already sent another request."""
+        self.connection.settimeout(0)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def finish(self):
+        if not self.close_connection:
+            self.wfile.flush()
+            if self.server.park(self):
+                return
+            self.close_connection = True
+        super().finish()
+
+    def log_error(self, format, *args):
+        # Idle keep-alive connections time out routinely; don't log them
+        if format.startswith('Request timed out'):
+            return
+        super().log_error(format, *args)
+
+    def send_response(self, code, message=None):
+        self.response_status = code
+        super().send_response(code, message)
+
     def do_GET(self):
+        """Serve a request, recording its latency and, when profiling, its hot stacks."""
+        path = urllib.parse.urlparse(self.path).path
+        route = path if path in ROUTES else 'static'
+        self.response_status = None
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            with profiler.track(f"{self.command} {self.path}") if profiler is not None else nullcontext():
+                self.route_request()
+        except StaleRecordError as e:
+            # An export was overwritten under the loaded index; the watcher reloads it shortly
+            self.log_error('%s', e)
+            if self.response_status is None:
+                self.send_error(503, 'Export files changed, reloading')
+            else:
+                self.close_connection = True
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            REQUEST_SECONDS.observe(time.perf_counter() - start, route=route)
+            REQUESTS.inc(route=route, status=self.response_status or 500)
+
+    # uuid lists too long for a URL can be sent to /api/export as a form
+    do_POST = do_GET
+
+    def route_request(self):
         parsed = urllib.parse.urlparse(self.path)
         path = parsed.path
         query = urllib.parse.parse_qs(parsed.query)
 
+        if self.command == 'POST':
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                length = -1
+            if path != '/api/export' or not 0 <= length <= MAX_POST_BYTES:
+                # The body is left unread, so the connection can't be reused
+                self.close_connection = True
+                if path != '/api/export':
+                    self.send_error(405, 'Only /api/export accepts POST')
+                else:
+                    self.send_error(400 if length < 0 else 413, 'Invalid form size')
+                return
+            form = urllib.parse.parse_qs(self.rfile.read(length).decode('utf-8', 'replace'))
+            for name, values in form.items():
+                query.setdefault(name, []).extend(values)
+
         if path == '/':
             self.serve_index()
         elif path == '/api/conversations':
             self.serve_conversation_list()
         elif path == '/api/conversation':
             uuid = query.get('id', [None])[0]
-            if uuid:
-                self.serve_conversation(uuid)
-            else:
+            if not uuid:
                 self.send_error(400, 'Missing conversation ID')
+                return
+            try:
+                offset = int_param(query, 'offset', 0)
+                limit = int_param(query, 'limit', None)
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+            around = query.get('around', [None])[0]
+            self.serve_conversation(uuid, offset, limit, around)
         elif path == '/api/search':
             q = query.get('q', [''])[0]
-            self.serve_search(q)
+            cursor = query.get('cursor', [None])[0]
+            try:
+                limit = int_param(query, 'limit', SEARCH_PAGE_SIZE)
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+            self.serve_search(q, cursor, max(1, min(limit, MAX_SEARCH_PAGE_SIZE)))
+        elif path == '/api/stats':
+            after = query.get('after', [None])[0]
+            before = query.get('before', [None])[0]
+            self.serve_stats(after, before, query.get('interval', ['day'])[0])
+        elif path == '/api/export':
+            ids = [uuid for value in query.get('ids', []) + query.get('id', [])
+                   for uuid in value.split(',') if uuid]
+            self.serve_export(ids, query.get('q', [None])[0], query.get('after', [None])[0],
+                              query.get('before', [None])[0], query.get('format', ['ndjson'])[0])
+        elif path == '/api/metrics':
+            self.send_body(metrics.REGISTRY.render().encode('utf-8'), metrics.CONTENT_TYPE)
         else:
             # Serve static files
             super().do_GET()
 
     def serve_index(self):
         """Serve the main HTML page."""
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
+        self.send_body(self.get_html_template().encode('utf-8'), 'text/html; charset=utf-8')
+
+    def send_body(self, body, content_type, status=200):
+        """Send a complete response, compressed if the client accepts it."""
+        encoding = None
+        if len(body) >= MIN_COMPRESS_SIZE:
+            encoding = choose_encoding(self.headers.get('Accept-Encoding'))
+            if encoding:
+                body = compress(body, encoding)
+        self.send_encoded(body, content_type, encoding, status)
+
+    def send_encoded(self, body, content_type, encoding, status=200, headers=None):
+        """Send an already encoded body with a Content-Length so the connection can be reused."""
+        self.send_response(status)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
+        self.wfile.write(body)
 
-        html = self.get_html_template()
-        self.wfile.write(html.encode('utf-8'))
+    def start_stream(self, content_type, encoding=None, headers=None):
+        """Send the headers of a response whose length isn't known; return a writer for its body.
 
-    def serve_conversation_list(self):
-        """Serve list of conversations as JSON."""
+        HTTP/1.1 clients get chunked encoding. For HTTP/1.0 the body ends
+        when the connection closes.
+        """
+        chunked = self.request_version == 'HTTP/1.1'
         self.send_response(200)
-        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-type', content_type)
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
         self.end_headers()
+        return ChunkedWriter(self.wfile, encoding, chunked)
+
+    def stream_json(self, pieces, content_type='application/json'):
+        """Send JSON text pieces, streaming them once they outgrow STREAM_THRESHOLD.
+
+        Returns the complete body without sending anything if it stays under
+        the threshold, so the caller can cache it and send it with a
+        Content-Length. Otherwise the response starts as soon as the
+        threshold is reached, the rest follows as it is produced, and None is
+        returned.
+        """
+        pieces = iter(pieces)
+        head = bytearray()
+        for piece in pieces:
+            head += piece.encode('utf-8')
+            if len(head) >= STREAM_THRESHOLD:
+                break
+        else:
+            return bytes(head)
+
+        writer = self.start_stream(content_type, choose_encoding(self.headers.get('Accept-Encoding')))
+        try:
+            writer.write(head)
+            del head
+            for piece in pieces:
+                writer.write(piece.encode('utf-8'))
+            writer.close()
+        except Exception:
+            # The status line is gone; an unterminated body tells the client it failed
+            self.close_connection = True
+            raise
+        return None
+
+    def send_json(self, data, status=200):
+        """Serialize and send a JSON response."""
+        self.send_body(json.dumps(data).encode('utf-8'), 'application/json', status)
 
-        convs = get_conversation_list()
-        self.wfile.write(json.dumps(convs).encode('utf-8'))
-
-    def serve_conversation(self, uuid):
-        """Serve a single conversation."""
-        conv = get_conversation(uuid)
+    def serve_conversation_list(self):
+        """Serve list of conversations as JSON, revalidated by ETag."""
+        cached = get_conversation_list_response()
+        encoding = choose_encoding(self.headers.get('Accept-Encoding'))
+        etag = f'"{cached["etag"]}-{encoding}"' if encoding else f'"{cached["etag"]}"'
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+        if self.not_modified(etag):
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
 
-        if not conv:
+        body = cached['encoded'].get(encoding)
+        if body is None:
+            body = cached['encoded'][encoding] = compress(cached['body'], encoding)
+        self.send_encoded(body, 'application/json', encoding, headers=headers)
+
+    def not_modified(self, etag):
+        """Check the request's If-None-Match header against an ETag."""
+        if_none_match = self.headers.get('If-None-Match', '')
+        return if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]
+
+    def serve_conversation(self, uuid, offset=0, limit=None, around=None):
+        """Serve a single conversation, optionally only a window of its messages.
+
+        Responses are cached serialized and compressed, so reopening a
+        conversation costs a lookup rather than formatting it again. Responses
+        larger than STREAM_THRESHOLD are streamed as they are formatted
+        instead, and not cached.
+        """
+        rec = load_conversations().records.get(uuid)
+        if rec is None:
             self.send_error(404, 'Conversation not found')
             return
 
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.end_headers()
+        key = (uuid, rec.updated_at, offset, limit, around)
+        entry = conversation_responses.get(key)
+        changed = entry is None
+        if entry is None:
+            result = get_conversation_window(uuid, offset, limit, around)
+            if not result:
+                self.send_error(404, 'Conversation not found')
+                return
+            body = self.stream_json(iter_json(result))
+            if body is None:
+                return
+            entry = {None: body}
+
+        encoding = None
+        if len(entry[None]) >= MIN_COMPRESS_SIZE:
+            encoding = choose_encoding(self.headers.get('Accept-Encoding'))
+        if encoding not in entry:
+            entry = {**entry, encoding: compress(entry[None], encoding)}
+            changed = True
+        if changed:
+            conversation_responses.put(key, entry, sum(len(body) for body in entry.values()))
+
+        self.send_encoded(entry[encoding], 'application/json', encoding)
+
+    def serve_search(self, query, cursor=None, limit=SEARCH_PAGE_SIZE):
+        """Search conversations, best matches first, one page at a time."""
+        index = get_search_index()
+        convs = index.store  # the store this index was built for, even mid-reload
+        try:
+            page, total, next_cursor = index.search(query, cursor, limit)
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
 
-        # Format messages for display
-        messages = []
-        for msg in conv.get('chat_messages', []):
-            messages.append({
-                'uuid': msg.get('uuid', ''),
-                'sender': msg.get('sender', 'unknown'),
-                'created_at': msg.get('created_at', ''),
-                'content': format_message_content(msg),
-                'attachments': msg.get('attachments', []),
-                'files': msg.get('files', [])
+        terms = index.matched_terms(query)
+        results = []
+        for score, created_at, uuid, hits in page:
+            rec = convs.records[uuid]
+            results.append({
+                'uuid': uuid,
+                'name': rec.name,
+                'summary': rec.summary,
+                'created_at': rec.created_at_text,
+                'message_count': rec.message_count,
+                'score': round(score, 4),
+                'match_type': 'message' if hits[0][2] >= 0 else 'title/summary',
+                'hits': hit_snippets(convs.get(uuid), hits, terms)
             })
 
-        result = {
-            'uuid': conv.get('uuid', ''),
-            'name': conv.get('name', 'Untitled'),
-            'summary': conv.get('summary', ''),
-            'created_at': conv.get('created_at', ''),
-            'updated_at': conv.get('updated_at', ''),
-            'messages': messages
-        }
+        self.send_json({
+            'results': results,
+            'total': total,
+            'next_cursor': next_cursor
+        })
 
-        self.wfile.write(json.dumps(result).encode('utf-8'))
+    def serve_stats(self, after=None, before=None, interval='day'):
+        """Serve message, tool and size statistics for a date range, from the rollups."""
+        try:
+            result = get_rollups().query(parse_date(after) if after else None,
+                                         parse_date(before) if before else None, interval)
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
+        self.send_json(result)
 
-    def serve_search(self, query):
-        """Search conversations."""
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.end_headers()
+    def serve_export(self, ids=(), query=None, after=None, before=None, format='ndjson'):
+        """Stream a set of conversations, as NDJSON or as a zip of Markdown files.
 
-        if not query:
-            self.wfile.write(json.dumps([]).encode('utf-8'))
+        Conversations are read from the store one at a time as the response
+        is written, so memory use doesn't grow with the size of the export.
+        """
+        if format not in export.FORMATS:
+            self.send_error(400, f"format must be one of: {', '.join(export.FORMATS)}")
+            return
+        try:
+            convs, records = select_conversations(ids, query, parse_date(after) if after else None,
+                                                  parse_date(before) if before else None)
+        except ValueError as e:
+            self.send_error(400, str(e))
             return
 
-        query_lower = query.lower()
-        results = []
-        convs = load_conversations()
-
-        for uuid, conv in convs.items():
-            # Search in name and summary
-            name = conv.get('name', '').lower()
-            summary = conv.get('summary', '').lower()
-
-            if query_lower in name or query_lower in summary:
-                results.append({
-                    'uuid': uuid,
-                    'name': conv.get('name', 'Untitled'),
-                    'summary': conv.get('summary', ''),
-                    'created_at': conv.get('created_at', ''),
-                    'match_type': 'title/summary'
-                })
-                continue
-
-            # Search in messages
-            for msg in conv.get('chat_messages', []):
-                text = msg.get('text', '').lower()
-                if query_lower in text:
-                    results.append({
-                        'uuid': uuid,
-                        'name': conv.get('name', 'Untitled'),
-                        'summary': conv.get('summary', ''),
-                        'created_at': conv.get('created_at', ''),
-                        'match_type': 'message'
-                    })
+        if format == 'ndjson':
+            writer = self.start_stream('application/x-ndjson', choose_encoding(self.headers.get('Accept-Encoding')))
+        else:
+            # Entries are already deflated; compressing the zip again gains nothing
+            writer = self.start_stream('application/zip', headers={
+                'Content-Disposition': 'attachment; filename="claude-conversations.zip"'})
+        try:
+            if format == 'ndjson':
+                written = export.write_ndjson(writer, convs, records)
+            else:
+                written = export.write_markdown_zip(writer, convs, records)
+            writer.close()
+        except Exception:
+            # The status line is gone; an unterminated body tells the client it failed
+            self.close_connection = True
+            raise
+        EXPORTED.inc(written, format=format)
+
+    def send_head(self):
+        """Serve a static file with Range support and precompressed siblings.
+
+        If ``file.br`` or ``file.gz`` exists next to a requested file, is at
+        least as new, and the client accepts that encoding, it is sent instead
+        with the matching Content-Encoding. Range requests are always answered
+        from the uncompressed file, since byte offsets (e.g. in the manifest)
+        refer to it.
+        """
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            # Directories, redirects and 404s
+            return super().send_head()
+
+        ctype = self.guess_type(path)
+        encoding = None
+        siblings = [(enc, path + suffix) for enc, suffix in (('br', '.br'), ('gzip', '.gz'))
+                    if os.path.isfile(path + suffix)]
+        if 'Range' not in self.headers:
+            accept = self.headers.get('Accept-Encoding')
+            for enc, sibling in siblings:
+                if accepts_encoding(accept, enc) and os.stat(sibling).st_mtime >= os.stat(path).st_mtime:
+                    path, encoding = sibling, enc
                     break
 
-        # Sort by date
-        results.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-        self.wfile.write(json.dumps(results[:100]).encode('utf-8'))  # Limit to 100 results
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(404, 'File not found')
+            return None
+
+        try:
+            st = os.fstat(f.fileno())
+            etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}{"-" + encoding if encoding else ""}"'
+            if self.not_modified(etag):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                f.close()
+                return None
+
+            start, end = 0, st.st_size - 1
+            status = 200
+            if_range = self.headers.get('If-Range')
+            if not if_range or if_range == etag:
+                try:
+                    byte_range = parse_range(self.headers.get('Range'), st.st_size)
+                except ValueError:
+                    self.send_response(416)
+                    self.send_header('Content-Range', f'bytes */{st.st_size}')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    f.close()
+                    return None
+                if byte_range:
+                    start, end = byte_range
+                    status = 206
+
+            self.send_response(status)
+            self.send_header('Content-type', ctype)
+            self.send_header('Content-Length', str(end - start + 1))
+            self.send_header('Last-Modified', self.date_time_string(st.st_mtime))
+            self.send_header('ETag', etag)
+            self.send_header('Accept-Ranges', 'bytes')
+            if status == 206:
+                self.send_header('Content-Range', f'bytes {start}-{end}/{st.st_size}')
+            if siblings:
+                self.send_header('Vary', 'Accept-Encoding')
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            self.end_headers()
+            return FileSlice(f, start, end - start + 1)
+        except Exception:
+            f.close()
+            raise
 
     def get_html_template(self):
         """Return the main HTML template."""
@@ -315,6 +1229,10 @@ class ConversationHandler(SimpleHTTPRequestHandler):
             overflow-y: auto;
         }
 
+        .virtual-row {
+            display: flow-root;
+        }
+
         .conversation-item {
             padding: 15px 20px;
             border-bottom: 1px solid #0f3460;
@@ -355,6 +1273,27 @@ class ConversationHandler(SimpleHTTPRequestHandler):
             overflow: hidden;
         }
 
+        .conversation-item .snippet {
+            font-size: 12px;
+            color: #aaa;
+            margin-top: 5px;
+            padding-left: 8px;
+            border-left: 2px solid #0f3460;
+            overflow: hidden;
+            text-overflow: ellipsis;
+        }
+
+        .conversation-item .snippet-label {
+            color: #e94560;
+        }
+
+        .conversation-item .snippet mark {
+            background: #e94560;
+            color: #fff;
+            border-radius: 2px;
+            padding: 0 2px;
+        }
+
         /* Main content */
         .main {
             flex: 1;
@@ -417,6 +1356,14 @@ class ConversationHandler(SimpleHTTPRequestHandler):
             border-bottom-left-radius: 5px;
         }
 
+        .message-placeholder {
+            height: 120px;
+        }
+
+        .message.hit .message-bubble {
+            box-shadow: 0 0 0 2px #e94560;
+        }
+
         .message-sender {
             font-size: 11px;
             color: #e94560;
@@ -548,6 +1495,199 @@ class ConversationHandler(SimpleHTTPRequestHandler):
     <script>
         let conversations = [];
         let currentConvId = null;
+        let search = { query: '', nextCursor: null, loading: false };
+        let view = { uuid: null, total: 0, hitIndex: -1, loading: false };
+        let sidebarList = null;  // VirtualList of the sidebar
+        let messageList = null;  // VirtualList of the open conversation, one slot per message
+        const MESSAGE_PAGE_SIZE = 50;
+
+        // Renders only the rows of a long list that are near the viewport.
+        // Nodes of rows scrolled out of view are reused for rows scrolled in;
+        // a row's height is estimated until it has been rendered and measured.
+        class VirtualList {
+            constructor(scroller, host, renderRow, options = {}) {
+                this.scroller = scroller;
+                this.host = host;
+                this.renderRow = renderRow;
+                this.onRange = options.onRange || null;  // called with the rendered [start, end)
+                this.overscan = options.overscan || 800;  // px rendered beyond each edge
+                this.estimate = options.rowHeight || 60;  // replaced by the first measured average
+                this.measuredEstimate = false;
+                this.before = document.createElement('div');
+                this.rows = document.createElement('div');
+                this.after = document.createElement('div');
+                this.items = [];
+                this.heights = [];
+                this.html = [];
+                this.nodes = new Map();  // index -> row node
+                this.pool = [];
+                this.frame = null;
+                this.schedule = this.schedule.bind(this);
+                scroller.addEventListener('scroll', this.schedule, { passive: true });
+                window.addEventListener('resize', this.schedule);
+                this.resizeObserver = typeof ResizeObserver !== 'undefined' ?
+                    new ResizeObserver(this.schedule) : null;
+            }
+
+            destroy() {
+                this.scroller.removeEventListener('scroll', this.schedule);
+                window.removeEventListener('resize', this.schedule);
+                if (this.resizeObserver) this.resizeObserver.disconnect();
+                if (this.frame !== null) cancelAnimationFrame(this.frame);
+            }
+
+            setItems(items) {
+                for (const node of this.nodes.values()) this.release(node);
+                this.nodes.clear();
+                this.items = items;
+                this.heights = new Array(items.length);
+                this.html = new Array(items.length);
+                if (this.host.firstChild !== this.before || this.host.childNodes.length !== 3) {
+                    this.host.replaceChildren(this.before, this.rows, this.after);
+                }
+                this.scroller.scrollTop = 0;
+                this.render();
+            }
+
+            appendItems(items) {
+                this.items.push(...items);
+                this.render();
+            }
+
+            // Replace items in place, re-rendering any that are on screen
+            updateItems(start, items) {
+                items.forEach((item, k) => {
+                    const index = start + k;
+                    this.items[index] = item;
+                    this.html[index] = undefined;
+                    this.heights[index] = undefined;
+                    const node = this.nodes.get(index);
+                    if (node) node.innerHTML = this.rowHtml(index);
+                });
+                this.render();
+            }
+
+            // Re-render every row, e.g. after the active row changed
+            refresh() {
+                this.html = new Array(this.items.length);
+                for (const [index, node] of this.nodes) node.innerHTML = this.rowHtml(index);
+                this.schedule();
+            }
+
+            rowHtml(index) {
+                if (this.html[index] === undefined) {
+                    this.html[index] = this.renderRow(this.items[index], index);
+                }
+                return this.html[index];
+            }
+
+            height(index) {
+                return this.heights[index] === undefined ? this.estimate : this.heights[index];
+            }
+
+            release(node) {
+                if (this.resizeObserver) this.resizeObserver.unobserve(node);
+                node.remove();
+                this.pool.push(node);
+            }
+
+            schedule() {
+                if (this.frame === null) {
+                    this.frame = requestAnimationFrame(() => {
+                        this.frame = null;
+                        this.render();
+                    });
+                }
+            }
+
+            // Offset of the list's first row within the scrolled content
+            hostTop() {
+                return this.before.getBoundingClientRect().top - this.scroller.getBoundingClientRect().top +
+                    this.scroller.scrollTop;
+            }
+
+            scrollToIndex(index, center = false) {
+                // Twice: the first pass measures the rows around the target
+                for (let pass = 0; pass < 2; pass++) {
+                    let y = this.hostTop();
+                    for (let i = 0; i < index; i++) y += this.height(i);
+                    if (center) y -= (this.scroller.clientHeight - this.height(index)) / 2;
+                    this.scroller.scrollTop = Math.max(0, y);
+                    this.render();
+                }
+            }
+
+            render() {
+                const n = this.items.length;
+                const scrollTop = this.scroller.scrollTop;
+                const top = scrollTop - this.hostTop();
+                const viewTop = top - this.overscan;
+                const viewBottom = top + this.scroller.clientHeight + this.overscan;
+
+                let i = 0;
+                let y = 0;
+                while (i < n && y + this.height(i) < viewTop) y += this.height(i++);
+                const start = i;
+                const startY = y;
+                while (i < n && y < viewBottom) y += this.height(i++);
+                const end = i;
+
+                // Recycle rows that left the window; rows that stay are not touched
+                for (const [index, node] of this.nodes) {
+                    if (index < start || index >= end) {
+                        this.nodes.delete(index);
+                        this.release(node);
+                    }
+                }
+                const head = document.createDocumentFragment();
+                const tail = document.createDocumentFragment();
+                let kept = false;
+                for (let k = start; k < end; k++) {
+                    if (this.nodes.has(k)) {
+                        kept = true;
+                        continue;
+                    }
+                    const node = this.pool.pop() || document.createElement('div');
+                    node.className = 'virtual-row';
+                    node.innerHTML = this.rowHtml(k);
+                    this.nodes.set(k, node);
+                    if (this.resizeObserver) this.resizeObserver.observe(node);
+                    (kept ? tail : head).appendChild(node);
+                }
+                this.rows.prepend(head);
+                this.rows.append(tail);
+                this.before.style.height = `${startY}px`;
+
+                // Measure; if rows above the viewport changed height, keep the view still
+                let shift = 0;
+                let changed = false;
+                let measuredTotal = 0;
+                y = startY;
+                for (let k = start; k < end; k++) {
+                    const old = this.height(k);
+                    const h = this.nodes.get(k).offsetHeight;
+                    measuredTotal += h;
+                    if (h !== old) {
+                        changed = true;
+                        if (y + old <= top) shift += h - old;
+                    }
+                    this.heights[k] = h;
+                    y += old;
+                }
+                if (!this.measuredEstimate && end > start) {
+                    this.estimate = measuredTotal / (end - start);
+                    this.measuredEstimate = true;
+                }
+
+                let rest = 0;
+                for (let k = end; k < n; k++) rest += this.height(k);
+                this.after.style.height = `${rest}px`;
+                if (shift) this.scroller.scrollTop = scrollTop + shift;
+                if (changed) this.schedule();
+                if (this.onRange) this.onRange(start, end);
+            }
+        }
+
 
         // Format date
         function formatDate(dateStr) {
@@ -577,66 +1717,153 @@ class ConversationHandler(SimpleHTTPRequestHandler):
         }
 
         // Render conversation list
-        function renderConversationList(convs) {
+        function renderConversationList(convs, append = false) {
             const list = document.getElementById('conversation-list');
 
-            if (convs.length === 0) {
+            if (convs.length === 0 && !append) {
                 list.innerHTML = '<div class="loading">No conversations found</div>';
                 return;
             }
 
-            list.innerHTML = convs.map(conv => `
+            // Only the rows in view are in the DOM, so filtering stays cheap
+            if (!sidebarList) sidebarList = new VirtualList(list, list, renderConversationItem, { rowHeight: 70 });
+            if (append) {
+                sidebarList.appendItems(convs);
+            } else {
+                sidebarList.setItems(convs);
+            }
+        }
+
+        function renderConversationItem(conv) {
+            return `
                 <div class="conversation-item ${conv.uuid === currentConvId ? 'active' : ''}"
                      onclick="loadConversation('${conv.uuid}')">
                     <h3>${escapeHtml(conv.name || 'Untitled')}</h3>
                     <div class="meta">${formatDate(conv.created_at)} • ${conv.message_count} messages</div>
                     ${conv.summary ? `<div class="summary">${escapeHtml(conv.summary)}</div>` : ''}
+                    ${(conv.hits || []).filter(hit => hit.message_uuid).map(hit => `
+                        <div class="snippet" onclick="event.stopPropagation(); loadConversation('${conv.uuid}', '${hit.message_uuid}')">
+                            ${highlightSnippet(hit)}
+                        </div>
+                    `).join('')}
+                </div>
+            `;
+        }
+
+        // Render a search snippet with its matches marked
+        function highlightSnippet(hit) {
+            const label = hit.tool !== undefined ? `Tool: ${hit.tool || 'unknown'}` : hit.file_name;
+            let html = label ? `<span class="snippet-label">[${escapeHtml(label)}]</span> ` : '';
+            if (hit.offset > 0) html += '…';
+            let pos = 0;
+            for (const [start, end] of hit.highlights) {
+                html += escapeHtml(hit.snippet.slice(pos, start));
+                html += `<mark>${escapeHtml(hit.snippet.slice(start, end))}</mark>`;
+                pos = end;
+            }
+            return html + escapeHtml(hit.snippet.slice(pos));
+        }
+
+        // Render a message, or a placeholder for one not fetched yet
+        function renderMessage(msg, index) {
+            if (!msg) return '<div class="message-placeholder"></div>';
+            return `
+                <div class="message ${msg.sender}${index === view.hitIndex ? ' hit' : ''}" data-uuid="${msg.uuid}">
+                    <div class="message-bubble">
+                        <div class="message-sender">${msg.sender}</div>
+                        <div class="message-content">${escapeHtml(msg.content)}</div>
+                        <div class="message-time">${formatDate(msg.created_at)}</div>
+                    </div>
                 </div>
-            `).join('');
+            `;
         }
 
-        // Load single conversation
-        async function loadConversation(uuid) {
+        // Fetch a window of a conversation's messages
+        async function fetchMessages(uuid, params) {
+            const res = await fetch(`/api/conversation?id=${uuid}&${params}`);
+            if (!res.ok) throw new Error(`${res.status} loading messages`);
+            return res.json();
+        }
+
+        // Load single conversation, optionally scrolling to a message
+        async function loadConversation(uuid, messageUuid = null) {
             currentConvId = uuid;
+            const state = { uuid, total: 0, hitIndex: -1, loading: true };
+            view = state;
 
             // Update sidebar
-            document.querySelectorAll('.conversation-item').forEach(el => {
-                el.classList.remove('active');
-            });
-            event.currentTarget?.classList.add('active');
+            if (sidebarList) sidebarList.refresh();
+            if (messageList) {
+                messageList.destroy();
+                messageList = null;
+            }
 
             // Show loading
-            document.getElementById('messages').innerHTML = '<div class="loading">Loading</div>';
+            const messagesEl = document.getElementById('messages');
+            messagesEl.innerHTML = '<div class="loading">Loading</div>';
             document.getElementById('conv-header').style.display = 'block';
 
             try {
-                const res = await fetch(`/api/conversation?id=${uuid}`);
-                const conv = await res.json();
+                // Only the first window is fetched; the rest pages in as it scrolls into view
+                let params = `limit=${MESSAGE_PAGE_SIZE}`;
+                if (messageUuid) params += `&around=${messageUuid}`;
+                const conv = await fetchMessages(uuid, params);
+                if (view !== state) return;  // another conversation was opened
+
+                state.total = conv.message_count;
+                const hit = messageUuid ? conv.messages.findIndex(msg => msg.uuid === messageUuid) : -1;
+                state.hitIndex = hit >= 0 ? conv.offset + hit : -1;
 
                 // Update header
                 document.getElementById('conv-title').textContent = conv.name || 'Untitled';
                 document.getElementById('conv-meta').textContent =
-                    `Created: ${formatDate(conv.created_at)} • ${conv.messages.length} messages`;
-
-                // Render messages
-                const messagesEl = document.getElementById('messages');
-                messagesEl.innerHTML = conv.messages.map(msg => `
-                    <div class="message ${msg.sender}">
-                        <div class="message-bubble">
-                            <div class="message-sender">${msg.sender}</div>
-                            <div class="message-content">${escapeHtml(msg.content)}</div>
-                            <div class="message-time">${formatDate(msg.created_at)}</div>
-                        </div>
-                    </div>
-                `).join('');
-
-                // Scroll to top
-                messagesEl.scrollTop = 0;
+                    `Created: ${formatDate(conv.created_at)} • ${conv.message_count} messages`;
+
+                // One slot per message; only the slots in view are rendered
+                const items = new Array(conv.message_count);
+                conv.messages.forEach((msg, k) => { items[conv.offset + k] = msg; });
+                messageList = new VirtualList(messagesEl, messagesEl, renderMessage, {
+                    rowHeight: 120,
+                    onRange: (start, end) => fillMessages(state, start, end)
+                });
+                messageList.setItems(items);
+
+                // Scroll to the search hit, or stay at the top
+                if (state.hitIndex >= 0) messageList.scrollToIndex(state.hitIndex, true);
+            } catch (err) {
+                messagesEl.innerHTML = '<div class="loading">Error loading conversation</div>';
+            } finally {
+                state.loading = false;
+            }
+            if (messageList && view === state) messageList.schedule();
+        }
 
+        // Fetch the window of messages covering the placeholders in view
+        async function fillMessages(state, start, end) {
+            if (view !== state || state.loading) return;
+            const items = messageList.items;
+            let first = start;
+            while (first < end && items[first]) first++;
+            if (first === end) return;
+            let last = end - 1;
+            while (items[last]) last--;
+
+            // Scrolling up, the window should end at the last missing message
+            const offset = first > 0 && !items[first - 1] ?
+                Math.max(0, last + 1 - MESSAGE_PAGE_SIZE) : first;
+
+            state.loading = true;
+            let conv;
+            try {
+                conv = await fetchMessages(state.uuid, `offset=${offset}&limit=${MESSAGE_PAGE_SIZE}`);
             } catch (err) {
-                document.getElementById('messages').innerHTML =
-                    '<div class="loading">Error loading conversation</div>';
+                console.error('Error loading messages:', err);
+                return;
+            } finally {
+                state.loading = false;
             }
+            if (view !== state || conv.messages.length === 0) return;
+            messageList.updateItems(conv.offset, conv.messages);
         }
 
         // Search
@@ -647,7 +1874,10 @@ class ConversationHandler(SimpleHTTPRequestHandler):
 
             searchTimeout = setTimeout(async () => {
                 if (query.length === 0) {
+                    search = { query: '', nextCursor: null, loading: false };
                     renderConversationList(conversations);
+                    document.getElementById('stats').textContent =
+                        `${conversations.length} conversations`;
                     return;
                 }
 
@@ -662,16 +1892,47 @@ class ConversationHandler(SimpleHTTPRequestHandler):
                 renderConversationList(localResults);
 
                 // Then server search for message content
-                try {
-                    const res = await fetch(`/api/search?q=${encodeURIComponent(query)}`);
-                    const results = await res.json();
-                    renderConversationList(results);
-                } catch (err) {
-                    console.error('Search error:', err);
-                }
+                search = { query, nextCursor: null, loading: false };
+                await loadSearchPage();
             }, 300);
         });
 
+        // Fetch the next page of server search results
+        async function loadSearchPage() {
+            const state = search;
+            const { query, nextCursor } = state;
+            state.loading = true;
+            try {
+                let url = `/api/search?q=${encodeURIComponent(query)}`;
+                if (nextCursor) url += `&cursor=${encodeURIComponent(nextCursor)}`;
+                const res = await fetch(url);
+                if (search !== state) return;  // a newer search started
+                if (!res.ok) {
+                    document.getElementById('stats').textContent = 'Invalid search (check dates and in: fields)';
+                    return;
+                }
+                const page = await res.json();
+                if (search !== state) return;
+                renderConversationList(page.results, Boolean(nextCursor));
+                state.nextCursor = page.next_cursor;
+                document.getElementById('stats').textContent =
+                    `${page.total} matching conversations`;
+            } catch (err) {
+                console.error('Search error:', err);
+            } finally {
+                state.loading = false;
+            }
+        }
+
+        // Page in more search results near the bottom of the list
+        document.getElementById('conversation-list').addEventListener('scroll', (e) => {
+            const list = e.target;
+            if (search.nextCursor && !search.loading &&
+                list.scrollTop + list.clientHeight > list.scrollHeight - 200) {
+                loadSearchPage();
+            }
+        });
+
         // Escape HTML
         function escapeHtml(text) {
             if (!text) return '';
@@ -700,14 +1961,25 @@ def main():
     print(f"\n🚀 Starting server at http://localhost:{PORT}")
     print(f"   Press Ctrl+C to stop\n")
 
+    global profiler
+    if PROFILE_SLOW_REQUESTS is not None:
+        profiler = metrics.SamplingProfiler(PROFILE_SLOW_REQUESTS, INDEX_DIR / "profiles", PROFILE_INTERVAL)
+        print(f"   Profiling requests slower than {PROFILE_SLOW_REQUESTS}s into {INDEX_DIR / 'profiles'}")
+    print(f"   Metrics at http://localhost:{PORT}/api/metrics")
+
     os.chdir(Path(__file__).parent)
-    server = HTTPServer(('localhost', PORT), ConversationHandler)
+    server = ExplorerServer(('localhost', PORT), ConversationHandler)
+
+    stop_watching = threading.Event()
+    threading.Thread(target=watch_data_dir, args=(stop_watching,), daemon=True).start()
 
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("\n\n👋 Server stopped")
+        stop_watching.set()
         server.shutdown()
+        server.server_close()
 
 
 if __name__ == '__main__':
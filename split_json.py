@@ -1,107 +1,212 @@
 #!/usr/bin/env python3
 """
 Split large JSON conversation files into smaller chunks for GitHub.
-Each chunk will be under 50MB.
+Each chunk will be under 50MB. Reruns only rewrite chunks whose
+conversations changed; pass --full to rebuild every chunk.
 """
 
+import gzip
+import itertools
 import json
+import math
 import os
+import sys
 from pathlib import Path
 
+from store import ConversationStore
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 SOURCE_DIR = Path("/Users/abhissrivasta/Downloads/279-Abhishek-bitsabhi-claude-account")
 OUTPUT_DIR = Path("/Users/abhissrivasta/github-repos-bitsabhi/claude-explorer/data")
 
 MAX_CHUNK_SIZE = 45 * 1024 * 1024  # 45MB to be safe
-
-def split_conversations():
-    OUTPUT_DIR.mkdir(exist_ok=True)
-
-    all_conversations = []
-
-    # Load all conversation files
-    for i in range(1, 5):
-        filepath = SOURCE_DIR / f"conversations {i}.json"
-        if filepath.exists():
-            print(f"Loading {filepath.name}...")
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    try:
-                        data = json.loads(content)
-                        if isinstance(data, list):
-                            all_conversations.extend(data)
-                            print(f"  ✓ {len(data)} conversations")
-                        else:
-                            all_conversations.append(data)
-                            print(f"  ✓ 1 conversation")
-                    except json.JSONDecodeError as e:
-                        print(f"  ⚠ JSON error, attempting recovery...")
-                        # Try to recover truncated JSON
-                        last_complete = content.rfind('},')
-                        if last_complete > 0 and content.strip().startswith('['):
-                            fixed = content[:last_complete+1] + ']'
-                            data = json.loads(fixed)
-                            all_conversations.extend(data)
-                            print(f"  ✓ Recovered {len(data)} conversations")
-            except Exception as e:
-                print(f"  ✗ Error: {e}")
-
-    print(f"\nTotal: {len(all_conversations)} conversations")
-
-    # Sort by date
-    all_conversations.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-
-    # Split into chunks
+WORKERS = os.cpu_count() or 1  # processes parsing source files in parallel
+COMPRESS_CHUNKS = True  # also write .gz (and .br with brotli installed) for server.py
+
+# Source file fingerprints, so reruns only rewrite chunks whose conversations changed
+STATE_DIR = SOURCE_DIR / ".claude-explorer" / "split"
+
+def write_compressed_copies(filepath):
+    """Write precompressed siblings of a chunk for servers that negotiate encoding."""
+    data = filepath.read_bytes()
+    copies = [('.gz', lambda: gzip.compress(data, compresslevel=9))]
+    if brotli is not None:
+        copies.append(('.br', lambda: brotli.compress(data, quality=9)))
+    for suffix, make in copies:
+        path = filepath.with_name(filepath.name + suffix)
+        path.write_bytes(make())
+        print(f"    {path.name}: {path.stat().st_size / (1024 * 1024):.1f}MB")
+
+def load_layout():
+    """Return the chunk layout from the existing manifest, or None if there is none."""
+    try:
+        with open(OUTPUT_DIR / "manifest.json", 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        return {chunk['file']: chunk['conversations'] for chunk in manifest['chunks']}
+    except (OSError, ValueError, KeyError):
+        return None
+
+def pack(records):
+    """Split records, in order, into the fewest chunks that fit, of similar size.
+
+    Sizes are the conversations' bytes in the source, which is what gets
+    written, so chunks come out evenly balanced rather than greedily filled.
+    """
+    total = sum(rec.length for rec in records)
+    for n in itertools.count(max(1, math.ceil(total / MAX_CHUNK_SIZE))):
+        chunks = pack_to(records, total / n)
+        # Chunks capped at MAX_CHUNK_SIZE can fall short of the target; then use one more
+        if len(chunks) <= n:
+            return chunks
+
+def pack_to(records, target):
+    """Split records into chunks, cutting as close as possible to multiples of ``target``."""
     chunks = []
     current_chunk = []
     current_size = 0
+    done = 0
 
-    for conv in all_conversations:
-        conv_json = json.dumps(conv)
-        conv_size = len(conv_json.encode('utf-8'))
+    for rec in records:
+        conv_size = rec.length
 
-        if current_size + conv_size > MAX_CHUNK_SIZE and current_chunk:
+        boundary = (len(chunks) + 1) * target
+        if current_chunk and (current_size + conv_size > MAX_CHUNK_SIZE
+                              or done + conv_size / 2 > boundary):
             chunks.append(current_chunk)
             current_chunk = []
             current_size = 0
 
-        current_chunk.append(conv)
+        current_chunk.append(rec)
         current_size += conv_size
+        done += conv_size
 
     if current_chunk:
         chunks.append(current_chunk)
+    return chunks
+
+def remove_chunk(filename):
+    """Delete a chunk and its precompressed copies."""
+    for suffix in ('', '.gz', '.br'):
+        try:
+            (OUTPUT_DIR / (filename + suffix)).unlink()
+        except FileNotFoundError:
+            pass
+
+def write_chunk(store, filename, chunk):
+    """Stream a chunk's conversations straight from the source bytes.
+
+    Returns the manifest entry of each conversation, with its byte offset
+    and length in the chunk so a client can fetch it with a Range request.
+    """
+    filepath = OUTPUT_DIR / filename
+    entries = []
+    with open(filepath, 'wb') as f:
+        f.write(b'[')
+        for i, rec in enumerate(chunk):
+            if i:
+                f.write(b',')
+            raw = store.read_bytes(rec.uuid)
+            entries.append({
+                'uuid': rec.uuid,
+                'name': rec.name,
+                'created_at': rec.created_at_text,
+                'updated_at': rec.updated_at_text,
+                'message_count': rec.message_count,
+                'offset': f.tell(),
+                'length': len(raw),
+            })
+            f.write(raw)
+        f.write(b']')
+
+    size_mb = filepath.stat().st_size / (1024 * 1024)
+    print(f"  {filename}: {len(chunk)} conversations, {size_mb:.1f}MB")
+    if COMPRESS_CHUNKS:
+        write_compressed_copies(filepath)
+    return entries
+
+def split_conversations(full=False):
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+
+    # Parse only source files that changed since the last run, in parallel
+    store = ConversationStore(SOURCE_DIR, STATE_DIR)
+    store.load_index()
+    changed = store.refresh(WORKERS)
+
+    layout = load_layout()
+    if layout is None or any(not (OUTPUT_DIR / name).exists() for name in layout):
+        full = True
+    if full:
+        for name in layout or ():
+            remove_chunk(name)
+        layout = {}
+    elif changed is None:
+        print("✓ Source files unchanged, nothing to do")
+        return
+
+    records = store.records
+    print(f"\nTotal: {len(records)} conversations")
+
+    # Keep chunks whose conversations are all unchanged; rewrite the rest
+    placed = set()
+    rewrite = []
+    for name, entries in layout.items():
+        placed.update(entry['uuid'] for entry in entries)
+        current = [records.get(entry['uuid']) for entry in entries]
+        if any(rec is None or rec.updated_at_text != entry['updated_at']
+               for rec, entry in zip(current, entries)):
+            rewrite.append((name, [rec for rec in current if rec is not None]))
+
+    # Conversations not in any chunk yet go to new chunks, newest first
+    added = [rec for uuid, rec in records.items() if uuid not in placed]
+    added.sort(key=lambda rec: rec.created_at, reverse=True)
+    print(f"{len(added)} new, {len(rewrite)} chunks to rewrite")
+
+    numbers = [int(name[len('conversations_'):-len('.json')]) for name in layout]
+    next_number = itertools.count(max(numbers, default=0) + 1)
+
+    pending = []
+    for name, chunk in rewrite:
+        del layout[name]
+        parts = pack(chunk)
+        if not parts:
+            remove_chunk(name)
+            print(f"  {name}: removed")
+            continue
+        # An updated chunk keeps its name; anything that no longer fits spills over
+        pending.append((name, parts[0]))
+        pending.extend((None, part) for part in parts[1:])
+    pending.extend((None, part) for part in pack(added))
+
+    for name, chunk in pending:
+        name = name or f"conversations_{next(next_number):02d}.json"
+        layout[name] = write_chunk(store, name, chunk)
+    store.close()
 
-    print(f"Split into {len(chunks)} chunks")
-
-    # Write chunks
+    # Write manifest
     manifest = {
-        'total_conversations': len(all_conversations),
+        'total_conversations': sum(len(entries) for entries in layout.values()),
         'chunks': []
     }
-
-    for i, chunk in enumerate(chunks):
-        filename = f"conversations_{i+1:02d}.json"
-        filepath = OUTPUT_DIR / filename
-
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(chunk, f, separators=(',', ':'))  # Compact JSON
-
-        size_mb = filepath.stat().st_size / (1024 * 1024)
-        print(f"  {filename}: {len(chunk)} conversations, {size_mb:.1f}MB")
-
+    for name in sorted(layout):
+        size_mb = (OUTPUT_DIR / name).stat().st_size / (1024 * 1024)
         manifest['chunks'].append({
-            'file': filename,
-            'count': len(chunk),
-            'size_mb': round(size_mb, 1)
+            'file': name,
+            'count': len(layout[name]),
+            'size_mb': round(size_mb, 1),
+            'conversations': layout[name]
         })
 
-    # Write manifest
     manifest_path = OUTPUT_DIR / "manifest.json"
     with open(manifest_path, 'w', encoding='utf-8') as f:
-        json.dump(manifest, f, indent=2)
+        json.dump(manifest, f, separators=(',', ':'))
 
     print(f"\n✓ Manifest written to {manifest_path}")
     print(f"✓ Total size: {sum(c['size_mb'] for c in manifest['chunks']):.1f}MB")
 
 if __name__ == '__main__':
-    split_conversations()
+    split_conversations(full='--full' in sys.argv[1:])
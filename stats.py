@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Claude Conversation Explorer - Stats
+Message, tool and size statistics answered from per-day rollups.
+
+Every conversation record carries its own per-day counts, computed once
+while the export files are parsed (see ``store.conversation_rollup``).
+``Rollups`` sums them into one entry per day and keeps the days sorted, so a
+date range is answered by adding up the days in it without decoding any
+conversation. After a reload only the conversations that changed are
+subtracted and added again.
+"""
+
+import bisect
+from collections import Counter
+from datetime import date, timedelta
+
+from store import DAY_MICROS, ROLLUP_COLUMNS, SENDERS
+
+INTERVALS = ('day', 'week', 'month', 'year')
+COUNT_COLUMNS = ROLLUP_COLUMNS[1:-1]  # summed per day; the last column is the tool counts
+_EPOCH_DATE = date(1970, 1, 1)
+
+
+class Day:
+    """Totals for one day: message counts by the day they were written,
+    conversation counts and sizes by the day the conversation started."""
+
+    __slots__ = ('counts', 'conversations', 'tools', 'message_sizes', 'byte_sizes')
+
+    def __init__(self):
+        self.counts = [0] * len(COUNT_COLUMNS)
+        self.conversations = 0
+        self.tools = Counter()          # tool name -> calls
+        self.message_sizes = Counter()  # bit length of message count -> conversations
+        self.byte_sizes = Counter()     # bit length of JSON size -> conversations
+
+    def copy(self):
+        day = Day()
+        day.counts = list(self.counts)
+        day.conversations = self.conversations
+        day.tools = Counter(self.tools)
+        day.message_sizes = Counter(self.message_sizes)
+        day.byte_sizes = Counter(self.byte_sizes)
+        return day
+
+    def prune(self):
+        """Drop counters that went to zero; return False if nothing is left."""
+        for counter in (self.tools, self.message_sizes, self.byte_sizes):
+            for key in [key for key, n in counter.items() if n <= 0]:
+                del counter[key]
+        return bool(self.conversations or any(self.counts) or self.tools)
+
+
+def same_counts(a, b):
+    """Check whether two records of a conversation contribute the same counts."""
+    return a is b or (a is not None and b is not None and a.created_at == b.created_at
+                      and a.message_count == b.message_count and a.length == b.length
+                      and a.rollup == b.rollup)
+
+
+def day_number(micros):
+    return micros // DAY_MICROS if micros else None
+
+
+def day_date(day):
+    return _EPOCH_DATE + timedelta(days=day)
+
+
+def interval_start(day, interval):
+    """Return the first day of the ``interval`` (weeks start on Monday) containing ``day``."""
+    if interval == 'day':
+        return day
+    if interval == 'week':
+        return day - (day + 3) % 7  # 1970-01-01 was a Thursday
+    d = day_date(day)
+    d = d.replace(day=1) if interval == 'month' else d.replace(month=1, day=1)
+    return (d - _EPOCH_DATE).days
+
+
+def size_buckets(counter):
+    """Turn bit-length counts into ``[{min, max, count}]``, smallest first."""
+    return [{'min': 1 << (bits - 1) if bits else 0, 'max': (1 << bits) - 1, 'count': n}
+            for bits, n in sorted(counter.items())]
+
+
+def sender_counts(counts, first):
+    """Return ``{sender: count}`` from the per-sender columns starting at ``first``."""
+    result = dict(zip(SENDERS + ('other',), counts[first::2][:len(SENDERS) + 1]))
+    if not result['other']:
+        del result['other']
+    return result
+
+
+class Rollups:
+    """Per-day totals over every conversation in a store.
+
+    Instances are not changed once built: ``updated`` returns new rollups,
+    so requests still using the old ones are unaffected by a reload.
+    """
+
+    def __init__(self):
+        self.days = {}     # day since the epoch (None if undated) -> Day
+        self.records = {}  # uuid -> the record counted in ``days``
+        self.dated = []    # days in ``days`` other than None, ascending
+
+    def updated(self, records):
+        """Return rollups for ``records``, recounting only conversations that changed."""
+        new = Rollups()
+        new.days = dict(self.days)
+        copied = {}
+
+        def day(key):
+            entry = copied.get(key)
+            if entry is None:
+                old = new.days.get(key)
+                entry = copied[key] = new.days[key] = old.copy() if old else Day()
+            return entry
+
+        for uuid, rec in self.records.items():
+            if not same_counts(records.get(uuid), rec):
+                new._add(rec, -1, day)
+        for uuid, rec in records.items():
+            if not same_counts(self.records.get(uuid), rec):
+                new._add(rec, 1, day)
+
+        for key, entry in copied.items():
+            if not entry.prune():
+                del new.days[key]
+        new.records = dict(records)
+        new.dated = sorted(key for key in new.days if key is not None)
+        return new
+
+    @staticmethod
+    def _add(rec, sign, day):
+        """Add (``sign`` 1) or remove (``sign`` -1) a record's counts."""
+        entry = day(day_number(rec.created_at))
+        entry.conversations += sign
+        entry.message_sizes[rec.message_count.bit_length()] += sign
+        entry.byte_sizes[rec.length.bit_length()] += sign
+        for row in rec.rollup:
+            entry = day(row[0])
+            counts = entry.counts
+            for i, value in enumerate(row[1:-1]):
+                counts[i] += sign * value
+            for name, calls in (row[-1] or {}).items():
+                entry.tools[name] += sign * calls
+
+    def query(self, after=None, before=None, interval='day'):
+        """Sum the days from ``after`` (inclusive) to ``before`` (exclusive).
+
+        Bounds are in microseconds since the epoch and apply to whole days;
+        undated messages only count when there are none. Returns totals, a
+        histogram with one entry per ``interval`` that has any activity,
+        calls per tool and the distributions of conversation sizes.
+        """
+        if interval not in INTERVALS:
+            raise ValueError(f"interval must be one of: {', '.join(INTERVALS)}")
+        lo = 0 if after is None else bisect.bisect_left(self.dated, after // DAY_MICROS)
+        hi = len(self.dated) if before is None else bisect.bisect_left(self.dated, -(-before // DAY_MICROS))
+        days = self.dated[lo:hi]
+        if after is None and before is None and None in self.days:
+            days.append(None)
+
+        counts = [0] * len(COUNT_COLUMNS)
+        conversations = 0
+        tools = Counter()
+        message_sizes = Counter()
+        byte_sizes = Counter()
+        buckets = {}  # interval start -> [conversations, tool calls, *counts]
+        for key in days:
+            entry = self.days[key]
+            conversations += entry.conversations
+            for i, value in enumerate(entry.counts):
+                counts[i] += value
+            tools.update(entry.tools)
+            message_sizes.update(entry.message_sizes)
+            byte_sizes.update(entry.byte_sizes)
+            if key is not None:
+                start = interval_start(key, interval)
+                bucket = buckets.get(start)
+                if bucket is None:
+                    bucket = buckets[start] = [0] * (len(COUNT_COLUMNS) + 2)
+                bucket[0] += entry.conversations
+                bucket[1] += sum(entry.tools.values())
+                for i, value in enumerate(entry.counts):
+                    bucket[i + 2] += value
+
+        return {
+            'after': day_date(after // DAY_MICROS).isoformat() if after is not None else None,
+            'before': day_date(-(-before // DAY_MICROS)).isoformat() if before is not None else None,
+            'interval': interval,
+            'totals': self._totals(conversations, sum(tools.values()), counts),
+            'histogram': [{'date': day_date(start).isoformat(), **self._totals(bucket[0], bucket[1], bucket[2:])}
+                          for start, bucket in sorted(buckets.items())],
+            'tools': [{'name': name, 'calls': calls} for name, calls in tools.most_common()],
+            'sizes': {
+                'messages_per_conversation': size_buckets(message_sizes),
+                'bytes_per_conversation': size_buckets(byte_sizes),
+            },
+        }
+
+    @staticmethod
+    def _totals(conversations, tool_calls, counts):
+        column = {name: value for name, value in zip(COUNT_COLUMNS, counts)}
+        return {
+            'conversations': conversations,
+            'messages': sender_counts(counts, 0),
+            'characters': sender_counts(counts, 1),
+            'tool_calls': tool_calls,
+            'attachments': column['attachments'],
+            'attachment_bytes': column['attachment_bytes'],
+            'files': column['files'],
+        }
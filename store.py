@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+"""
+Claude Conversation Explorer - Conversation Store
+Indexes Claude export files by byte offset so conversations can be read lazily.
+"""
+
+import codecs
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+INDEX_VERSION = 5
+INDEX_FILENAME = "index.json"
+READ_CHUNK_SIZE = 1024 * 1024  # 1MB reads while streaming
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+_WHITESPACE = ' \t\n\r'
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')  # characters that could still extend a number
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+DAY_MICROS = 86400 * 1000000
+SENDERS = ('human', 'assistant')  # anything else is counted as 'other'
+# Columns of a rollup row, one row per day a conversation has messages on
+ROLLUP_COLUMNS = ('day', 'human_messages', 'human_characters', 'assistant_messages',
+                  'assistant_characters', 'other_messages', 'other_characters',
+                  'attachments', 'attachment_bytes', 'files', 'tools')
+
+
+def utf8_len(text):
+    """Return the UTF-8 encoded length of a string."""
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+
+def iter_json_array(f, chunk_size=READ_CHUNK_SIZE):
+    """Yield ``(value, offset, length)`` for each element of a top-level JSON array.
+
+    ``f`` is a binary file. It is read in chunks and each element is decoded
+    as soon as it is complete, so only one element is held in memory at a
+    time. ``offset`` and ``length`` locate the element's bytes in the file.
+    A top-level object is yielded as a single element. If the file is
+    truncated or malformed, every complete element before the damage is
+    yielded and the decode error is re-raised afterwards.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    pos = 0
+    pos_bytes = 0  # file offset of buf[pos]
+    eof = False
+
+    def fill(size):
+        nonlocal buf, pos, eof
+        while not eof:
+            data = f.read(size)
+            text = utf8.decode(data, final=not data)
+            if not data:
+                eof = True
+            if text:
+                buf = buf[pos:] + text
+                pos = 0
+                return True
+        return False
+
+    def skip_whitespace():
+        nonlocal pos, pos_bytes
+        while True:
+            start = pos
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            pos_bytes += pos - start
+            if pos < len(buf) or not fill(chunk_size):
+                return pos < len(buf)
+
+    def advance(end):
+        nonlocal pos, pos_bytes
+        pos_bytes += utf8_len(buf[pos:end])
+        pos = end
+
+    if not skip_whitespace():
+        return
+    if buf[pos] == '\ufeff':
+        advance(pos + 1)
+        if not skip_whitespace():
+            return
+
+    in_array = buf[pos] == '['
+    if in_array:
+        advance(pos + 1)
+        if skip_whitespace() and buf[pos] == ']':
+            return
+
+    while True:
+        if not skip_whitespace():
+            raise json.JSONDecodeError('Unexpected end of file', buf, pos)
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+            # A number at the end of the buffer may continue in the next read,
+            # even past what decoded: "4." is the start of "4.5"
+            if not eof and _NUMBER_TAIL.match(buf, end).end() == len(buf):
+                raise json.JSONDecodeError('Value may continue', buf, end)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Grow the read with the pending element so retries stay linear
+            fill(max(chunk_size, len(buf) - pos))
+            continue
+
+        offset = pos_bytes
+        advance(end)
+        yield value, offset, pos_bytes - offset
+
+        if not in_array:
+            return
+        if not skip_whitespace():
+            raise json.JSONDecodeError('Unexpected end of file', buf, pos)
+        if buf[pos] == ',':
+            advance(pos + 1)
+        elif buf[pos] == ']':
+            return
+        else:
+            raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+
+
+def source_files(data_dir):
+    """Return the export files present in a data directory, in load order."""
+    data_dir = Path(data_dir)
+    paths = (data_dir / f"conversations {i}.json" for i in range(1, 5))
+    return [path for path in paths if path.exists()]
+
+
+def file_signature(path):
+    """Return the size and mtime used to tell whether a file has changed."""
+    st = path.stat()
+    return {'size': st.st_size, 'mtime': st.st_mtime_ns}
+
+
+def file_hash(path):
+    """Return the SHA-1 of a file's contents."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def detect_changes(known_files, paths):
+    """Compare export files on disk with the fingerprints recorded for them.
+
+    Returns ``(changed, removed, fingerprints)``: the paths whose contents
+    changed or are new, the names of recorded files that are gone, and the
+    current ``{name: {size, mtime, sha1}}`` of every file. Files are only
+    hashed when their size or mtime moved, so a touched but identical file
+    is not reparsed.
+    """
+    changed = []
+    fingerprints = {}
+    for path in paths:
+        sig = file_signature(path)
+        old = known_files.get(path.name)
+        if old and old['size'] == sig['size'] and old['mtime'] == sig['mtime']:
+            sig['sha1'] = old['sha1']
+        else:
+            sig['sha1'] = file_hash(path)
+            if not old or old['sha1'] != sig['sha1']:
+                changed.append(path)
+        fingerprints[path.name] = sig
+    removed = [name for name in known_files if name not in fingerprints]
+    return changed, removed, fingerprints
+
+
+def parse_timestamp(text):
+    """Parse an ISO 8601 timestamp into integer microseconds since the epoch (0 if missing or invalid)."""
+    if not text:
+        return 0
+    try:
+        dt = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return 0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    delta = dt - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def format_timestamp(micros):
+    """Format integer microseconds since the epoch as an ISO 8601 UTC timestamp ('' for 0)."""
+    if not micros:
+        return ''
+    return (_EPOCH + timedelta(microseconds=micros)).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def message_characters(msg):
+    """Return the length of a message's text, from its content blocks if it has no ``text``."""
+    text = msg.get('text')
+    if isinstance(text, str) and text:
+        return len(text)
+    return sum(len(item.get('text') or '') for item in msg.get('content') or []
+               if isinstance(item, dict) and item.get('type') == 'text')
+
+
+def conversation_rollup(conv):
+    """Count a conversation's messages, characters, attachments and tool calls per day.
+
+    Returns one row per day, laid out as in ``ROLLUP_COLUMNS``: ``day`` is
+    days since the epoch (None if undated) and ``tools`` maps tool names to
+    calls, or is None when there were none. Messages without a timestamp
+    count on the conversation's day.
+    """
+    created_at = parse_timestamp(conv.get('created_at'))
+    rows = {}
+    for msg in conv.get('chat_messages') or []:
+        if not isinstance(msg, dict):
+            continue
+        micros = parse_timestamp(msg.get('created_at')) or created_at
+        day = micros // DAY_MICROS if micros else None
+        row = rows.get(day)
+        if row is None:
+            row = rows[day] = [day, 0, 0, 0, 0, 0, 0, 0, 0, 0, None]
+        sender = msg.get('sender')
+        column = 1 + 2 * (SENDERS.index(sender) if sender in SENDERS else len(SENDERS))
+        row[column] += 1
+        row[column + 1] += message_characters(msg)
+
+        for attachment in msg.get('attachments') or []:
+            if isinstance(attachment, dict):
+                size = attachment.get('file_size')
+                if not isinstance(size, int):
+                    size = utf8_len(attachment.get('extracted_content') or '')
+                row[7] += 1
+                row[8] += size
+        row[9] += sum(1 for f in msg.get('files') or [] if isinstance(f, dict))
+        for item in msg.get('content') or []:
+            if isinstance(item, dict) and item.get('type') == 'tool_use':
+                tools = row[10] = row[10] or {}
+                name = sys.intern(str(item.get('name') or 'unknown'))
+                tools[name] = tools.get(name, 0) + 1
+    return list(rows.values())
+
+
+class ConversationRecord:
+    """Where a conversation lives on disk, plus the metadata served without decoding it.
+
+    Records stay resident for every conversation, so they use slots and share
+    one string per file name. Timestamps are parsed once into integer
+    microseconds for sorting and filtering; ``created_at_text`` and
+    ``updated_at_text`` keep the values from the export, which are what is
+    served.
+    ``rollup`` holds the conversation's per-day counts for /api/stats (see
+    ``conversation_rollup``), so statistics never need the bodies.
+    """
+
+    __slots__ = ('uuid', 'file', 'offset', 'length', 'name', 'summary',
+                 'created_at', 'updated_at', 'created_at_text', 'updated_at_text', 'message_count', 'rollup')
+
+    def __init__(self, uuid, file, offset, length, name, summary, created_at, updated_at, created_at_text,
+                 updated_at_text, message_count, rollup=()):
+        self.uuid = uuid
+        self.file = sys.intern(file)
+        self.offset = offset
+        self.length = length
+        self.name = name
+        self.summary = summary
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.created_at_text = created_at_text
+        self.updated_at_text = updated_at_text
+        self.message_count = message_count
+        self.rollup = rollup
+
+    def __reduce__(self):
+        # Rebuild through __init__ so records from worker processes share file names
+        return ConversationRecord, tuple(self.to_row())
+
+    def to_row(self):
+        """Return the record as a list, the form saved in the index."""
+        return [getattr(self, name) for name in self.__slots__]
+
+
+def conversation_record(conv, filename, offset, length):
+    """Build the index entry for a conversation."""
+    return ConversationRecord(
+        conv['uuid'],
+        filename,
+        offset,
+        length,
+        conv.get('name', 'Untitled'),
+        conv.get('summary', ''),
+        parse_timestamp(conv.get('created_at')),
+        parse_timestamp(conv.get('updated_at')),
+        conv.get('created_at', ''),
+        conv.get('updated_at', ''),
+        len(conv.get('chat_messages', [])),
+        conversation_rollup(conv),
+    )
+
+
+def scan_file(filepath, indexer_class=None, indexer_path=None, skip=()):
+    """Stream one export file and return where each of its conversations lives.
+
+    This is the unit of work for parallel ingest, so it may run in a worker
+    process and only hands back compact records. If ``indexer_class`` is
+    given, an instance is fed every conversation (via ``add``) and then
+    written to ``indexer_path`` (via ``write``), so a secondary index is built
+    in the same pass. Conversations whose ``(uuid, updated_at)`` is in
+    ``skip`` (with ``updated_at`` as parsed by ``parse_timestamp``) are
+    already indexed and are not fed to it.
+    """
+    filepath = Path(filepath)
+    result = {
+        'file': filepath.name,
+        'records': [],
+        'count': 0,
+        'error': None,
+        'truncated': False,
+        'indexer_path': None,
+    }
+    indexer = indexer_class() if indexer_class else None
+
+    try:
+        with open(filepath, 'rb') as f:
+            for conv, offset, length in iter_json_array(f):
+                if isinstance(conv, dict) and 'uuid' in conv:
+                    rec = conversation_record(conv, filepath.name, offset, length)
+                    result['records'].append(rec)
+                    if indexer is not None and (rec.uuid, rec.updated_at) not in skip:
+                        indexer.add(conv)
+                result['count'] += 1
+    except json.JSONDecodeError as e:
+        result['error'] = f"JSON error in {filepath.name}: {e}"
+        result['truncated'] = True
+    except Exception as e:
+        result['error'] = f"Error loading {filepath.name}: {e}"
+
+    if indexer is not None and len(indexer):
+        indexer.write(indexer_path)
+        result['indexer_path'] = str(indexer_path)
+    return result
+
+
+def scan_files(paths, workers=DEFAULT_WORKERS, indexer_class=None, indexer_paths=None, skip=()):
+    """Scan export files, one worker process per file, yielding results in file order."""
+    paths = list(paths)
+    indexer_paths = list(indexer_paths or [None] * len(paths))
+    workers = min(workers, len(paths))
+    if workers <= 1:
+        for path, indexer_path in zip(paths, indexer_paths):
+            yield scan_file(path, indexer_class, indexer_path, skip)
+        return
+
+    n = len(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(scan_file, paths, [indexer_class] * n, indexer_paths, [skip] * n)
+
+
+def print_scan_result(result):
+    """Report how a file scan went."""
+    if result['truncated']:
+        print(f"  ⚠ {result['error']}")
+        print(f"  ✓ Recovered {result['count']} conversations")
+    elif result['error']:
+        print(f"  ✗ {result['error']}")
+    else:
+        print(f"  ✓ {result['file']}: {result['count']} conversations")
+
+
+class StaleRecordError(OSError):
+    """A conversation's source file was changed after it was indexed."""
+
+
+class ConversationStore:
+    """Conversation index backed by the export files on disk.
+
+    Only metadata and byte offsets stay in memory. Conversation bodies are
+    read on demand from a file descriptor kept open on their source file,
+    and checked against the size and mtime the file was indexed at.
+    """
+
+    def __init__(self, data_dir, index_dir=None):
+        self.data_dir = Path(data_dir)
+        self.index_dir = Path(index_dir) if index_dir else self.data_dir / ".claude-explorer"
+        self.index_path = self.index_dir / INDEX_FILENAME
+        self.files = {}         # name -> {size, mtime, sha1} of each indexed file
+        self.file_records = {}  # name -> records of every conversation in that file
+        self.records = {}       # uuid -> record of the copy that wins
+        self.generation = 0     # bumped whenever the records change
+        self._files = {}  # name -> source file opened for reading
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, uuid):
+        return uuid in self.records
+
+    def open(self, workers=DEFAULT_WORKERS):
+        """Load the on-disk index and bring it up to date with the export files."""
+        self.load_index()
+        self.refresh(workers)
+        return self
+
+    def clear(self):
+        """Forget everything indexed so the next refresh parses every file."""
+        self.files = {}
+        self.file_records = {}
+        self.records = {}
+
+    def ingest(self, workers=DEFAULT_WORKERS, indexer_class=None, indexer_prefix=None):
+        """Parse every export file from scratch; see ``refresh``."""
+        self.clear()
+        return self.refresh(workers, indexer_class, indexer_prefix) or []
+
+    def load_index(self):
+        """Load a saved index, which may be out of date. Returns False if there is none."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if index.get('version') != INDEX_VERSION:
+            return False
+
+        self.files = index['files']
+        self.file_records = {name: [] for name in self.files}
+        for row in index['conversations']:
+            rec = ConversationRecord(*row)
+            self.file_records[rec.file].append(rec)
+        self._merge_records()
+        print(f"  ✓ Loaded index of {len(self.records)} conversations from {self.index_path}")
+        return True
+
+    def _merge_records(self):
+        """Rebuild the uuid lookup; later files win when a conversation appears more than once."""
+        records = {}
+        for name in self.files:
+            for rec in self.file_records.get(name, ()):
+                records[rec.uuid] = rec
+        self.records = records
+        self.generation += 1
+
+    def refresh(self, workers=DEFAULT_WORKERS, indexer_class=None, indexer_prefix=None, skip=()):
+        """Bring the index up to date, parsing only export files that changed.
+
+        Changed files are parsed in parallel by up to ``workers`` processes.
+        If ``indexer_class`` is given, a secondary index is built in the same
+        pass for each changed file (see ``scan_file``), leaving out the
+        conversations in ``skip``, and written to ``indexer_prefix`` + a
+        sequence number.
+
+        Returns None if nothing changed, otherwise the paths of the indexes
+        that were written.
+        """
+        paths = source_files(self.data_dir)
+        changed, removed, fingerprints = detect_changes(self.files, paths)
+        if not changed and not removed:
+            if fingerprints != self.files:
+                # Only mtimes moved; remember them so the files aren't hashed again
+                self.files = fingerprints
+                self.save_index()
+            return None
+
+        for name in removed:
+            print(f"  - {name} was removed")
+        indexer_paths = None
+        if indexer_class:
+            indexer_paths = [Path(f"{indexer_prefix}{i + 1:04d}") for i in range(len(changed))]
+
+        print(f"Indexing {len(changed)} changed files with {max(1, min(workers, len(changed)))} workers...")
+        written = []
+        for result in scan_files(changed, workers, indexer_class, indexer_paths, skip):
+            print_scan_result(result)
+            self.file_records[result['file']] = result['records']
+            if result['indexer_path']:
+                written.append(Path(result['indexer_path']))
+        for name in removed:
+            self.file_records.pop(name, None)
+        for path in changed:
+            # Readers may still hold the old file; let it go rather than close it under them
+            self._files.pop(path.name, None)
+        for name in removed:
+            self._files.pop(name, None)
+
+        self.files = fingerprints
+        self._merge_records()
+        self.save_index()
+        return written
+
+    def save_index(self):
+        """Write the index next to the data, replacing any previous one atomically."""
+        index = {
+            'version': INDEX_VERSION,
+            'files': self.files,
+            'conversations': [rec.to_row() for name in self.files for rec in self.file_records.get(name, ())],
+        }
+        try:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f, separators=(',', ':'))
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"  ⚠ Could not save index to {self.index_path}: {e}")
+
+    def _open(self, filename):
+        """Return a source file opened for reading, opening it on first use."""
+        f = self._files.get(filename)
+        if f is None:
+            f = open(self.data_dir / filename, 'rb')
+            # Another request thread may have opened it first; keep one file
+            kept = self._files.setdefault(filename, f)
+            if kept is not f:
+                f.close()
+                f = kept
+        return f
+
+    def read_bytes(self, uuid):
+        """Return the raw JSON bytes of a conversation, or None if unknown.
+
+        Raises StaleRecordError if the source file no longer matches the
+        index, e.g. because a new export was copied over it in place.
+        """
+        rec = self.records.get(uuid)
+        if rec is None:
+            return None
+        f = self._open(rec.file)
+        # pread past the end of a truncated file comes back short, where a
+        # memory map would fault
+        raw = os.pread(f.fileno(), rec.length, rec.offset)
+        st = os.fstat(f.fileno())
+        known = self.files.get(rec.file)
+        if (len(raw) != rec.length or known is None
+                or st.st_size != known['size'] or st.st_mtime_ns != known['mtime']):
+            raise StaleRecordError(f"{rec.file} changed since it was indexed")
+        return raw
+
+    def get(self, uuid):
+        """Decode a single conversation from disk."""
+        raw = self.read_bytes(uuid)
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            raise StaleRecordError(f"conversation {uuid} no longer decodes: {e}") from e
+
+    def iter_conversations(self):
+        """Decode every conversation in file order."""
+        for rec in sorted(self.records.values(), key=lambda r: (r.file, r.offset)):
+            yield self.get(rec.uuid)
+
+    def list(self):
+        """Return conversation metadata sorted newest first."""
+        records = sorted(self.records.values(), key=lambda r: r.created_at, reverse=True)
+        return [{
+            'uuid': rec.uuid,
+            'name': rec.name,
+            'summary': rec.summary,
+            'created_at': rec.created_at_text,
+            'updated_at': rec.updated_at_text,
+            'message_count': rec.message_count,
+        } for rec in records]
+
+    def close(self):
+        """Close the source files."""
+        for f in self._files.values():
+            f.close()
+        self._files = {}
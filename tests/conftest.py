@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The explorer's modules live at the top of the repository
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from generate_export import generate  # noqa: E402
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """A small synthetic export in two files, the same on every run."""
+    path = tmp_path / 'data'
+    generate(path, conversations=120, files=2, seed=7, vocabulary=300, message_words=30, max_messages=8)
+    return path
@@ -0,0 +1,83 @@
+"""Tests for NDJSON and Markdown zip exports."""
+
+import io
+import json
+import zipfile
+
+from export import fence, write_markdown_zip, write_ndjson
+from store import ConversationStore
+
+
+class Unseekable:
+    """A write-only stream like a socket: no seek or tell."""
+
+    def __init__(self):
+        self.out = io.BytesIO()
+
+    def write(self, data):
+        return self.out.write(data)
+
+    def flush(self):
+        pass
+
+
+def test_ndjson_writes_conversations_as_exported(data_dir):
+    store = ConversationStore(data_dir).open(workers=1)
+    records = sorted(store.records.values(), key=lambda rec: (rec.file, rec.offset))
+    out = io.BytesIO()
+    assert write_ndjson(out, store, records) == len(store)
+    lines = out.getvalue().splitlines()
+    assert lines == [store.read_bytes(rec.uuid) for rec in records]
+    assert [json.loads(line) for line in lines] == list(store.iter_conversations())
+
+
+def test_ndjson_joins_pretty_printed_conversations(tmp_path):
+    convs = [{'uuid': 'a', 'name': 'Line\nbreak'}, {'uuid': 'b', 'name': 'Plain'}]
+    (tmp_path / 'conversations 1.json').write_text(json.dumps(convs, indent=2))
+    store = ConversationStore(tmp_path).open(workers=1)
+    out = io.BytesIO()
+    assert write_ndjson(out, store, [store.records['a'], store.records['b']]) == 2
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == convs
+
+
+def test_markdown_zip(tmp_path):
+    convs = [
+        {'uuid': 'aaaaaaaa-1', 'name': 'Fix: the build?', 'summary': 'Why it broke',
+         'created_at': '2024-03-01T10:00:00Z', 'updated_at': '2024-03-02T10:00:00Z', 'chat_messages': [
+             {'sender': 'human', 'text': 'it fails', 'created_at': '2024-03-01T10:00:00Z',
+              'attachments': [{'file_name': 'log.txt', 'extracted_content': 'error: ```nested```'}]},
+             {'sender': 'assistant', 'created_at': '2024-03-01T10:01:00Z', 'content': [
+                 {'type': 'text', 'text': 'Let me check.'},
+                 {'type': 'tool_use', 'id': 't1', 'name': 'bash', 'input': {'command': 'make'}},
+                 {'type': 'tool_result', 'tool_use_id': 't1', 'is_error': True, 'content': 'exit 2'},
+             ]},
+         ]},
+        # Same name and uuid prefix, so the file name needs the whole uuid
+        {'uuid': 'aaaaaaaa-2', 'name': 'Fix: the build?', 'created_at': '2024-03-01T12:00:00Z'},
+        {'uuid': 'undated'},
+    ]
+    (tmp_path / 'conversations 1.json').write_text(json.dumps(convs))
+    store = ConversationStore(tmp_path).open(workers=1)
+
+    out = Unseekable()
+    records = [store.records[conv['uuid']] for conv in convs]
+    assert write_markdown_zip(out, store, records) == 3
+    with zipfile.ZipFile(io.BytesIO(out.out.getvalue())) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == ['2024-03-01-Fix-the-build-aaaaaaaa.md', '2024-03-01-Fix-the-build-aaaaaaaa-2.md',
+                                 'undated-Untitled-undated.md']
+        assert zf.getinfo('2024-03-01-Fix-the-build-aaaaaaaa.md').date_time == (2024, 3, 2, 10, 0, 0)
+        assert zf.getinfo('undated-Untitled-undated.md').date_time == (1980, 1, 1, 0, 0, 0)
+        text = zf.read('2024-03-01-Fix-the-build-aaaaaaaa.md').decode('utf-8')
+
+    assert text.startswith('# Fix: the build?\n\n- Created: 2024-03-01T10:00:00Z\n')
+    assert '> Why it broke' in text
+    assert '## Human · 2024-03-01 10:00\n\nit fails' in text
+    assert '**Attachment: log.txt**\n\n````\nerror: ```nested```\n````' in text
+    assert '**Tool call: bash**\n\n```json\n{\n  "command": "make"\n}\n```' in text
+    assert '**Tool result: bash** (error)\n\n```\nexit 2\n```' in text
+
+
+def test_fence_outlasts_backtick_runs():
+    assert fence('plain') == '```\nplain\n```'
+    assert fence('a ````` b', 'py') == '``````py\na ````` b\n``````'
@@ -0,0 +1,230 @@
+"""Tests for the search index."""
+
+import json
+
+import pytest
+
+from search_index import (FIELDS, SearchIndex, SegmentBuilder, decode_cursor, edit_distance, encode_cursor,
+                          hit_snippets, iter_units, parse_date, regex_literals, tokenize)
+from store import ConversationStore
+
+
+def open_index(data_dir):
+    """Index an export the way the server does; returns ``(store, index)``."""
+    store = ConversationStore(data_dir)
+    index = SearchIndex(store.index_dir / 'search')
+    segments = store.refresh(1, SegmentBuilder, index.new_segment_prefix())
+    index.update(segments, store.files, store)
+    return store, index
+
+
+def conversation(uuid, name, *texts, day=1):
+    """A conversation of alternating human and assistant messages."""
+    return {
+        'uuid': uuid,
+        'name': name,
+        'created_at': f'2024-01-{day:02d}T10:00:00Z',
+        'updated_at': f'2024-01-{day:02d}T11:00:00Z',
+        'chat_messages': [{'uuid': f'{uuid}-{i}', 'sender': ('human', 'assistant')[i % 2], 'text': text,
+                           'created_at': f'2024-01-{day:02d}T10:{i:02d}:00Z'} for i, text in enumerate(texts)],
+    }
+
+
+def write_export(path, convs, number=1):
+    path.mkdir(parents=True, exist_ok=True)
+    (path / f'conversations {number}.json').write_text(json.dumps(convs), encoding='utf-8')
+    return path
+
+
+def brute_force(store, matches):
+    """Return the uuids of the conversations with a unit whose tokens satisfy ``matches``."""
+    return {uuid for uuid in store.records
+            if any(matches(tokenize(unit[3])) for unit in iter_units(store.get(uuid)))}
+
+
+def test_cursor_round_trip():
+    key = (1.25, 1700000000000000, 'abc')
+    assert decode_cursor(encode_cursor(key)) == list(key)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not base64!', encode_cursor([1, 2])])
+def test_decode_cursor_invalid(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('pattern, expected', [
+    ('hello', ['hello']),
+    ('foo.bar', ['foo', 'bar']),
+    ('colou?r', ['colo', 'r']),
+    ('ab+c', ['ab', 'c']),
+    (r'\d+abc', ['abc']),
+    ('[xyz]abc(def)?ghi', ['abc', 'ghi']),
+    ('a|b', []),
+])
+def test_regex_literals(pattern, expected):
+    assert regex_literals(pattern) == expected
+
+
+@pytest.mark.parametrize('a, b, distance', [
+    ('search', 'search', 0),
+    ('search', 'serach', 1),   # swapped neighbours count once
+    ('search', 'sarch', 1),
+    ('search', 'searching', 3),
+    ('kitten', 'sitting', 3),
+])
+def test_edit_distance(a, b, distance):
+    assert edit_distance(a, b, 3) == distance
+    assert edit_distance(a, b, 1) == min(distance, 2)
+
+
+@pytest.mark.parametrize('query, matches', [
+    ('the ', lambda tokens: 'the' in tokens),
+    ('"of the"', lambda tokens: any(pair == ('of', 'the') for pair in zip(tokens, tokens[1:]))),
+    ('the of ', lambda tokens: 'the' in tokens and 'of' in tokens),
+])
+def test_common_words_match_every_conversation(data_dir, query, matches):
+    store, index = open_index(data_dir)
+    expected = brute_force(store, matches)
+    assert 0 < len(expected) < len(store)
+    page, total, cursor = index.search(query, limit=len(store))
+    assert total == len(expected)
+    assert {uuid for score, created_at, uuid, hits in page} == expected
+
+
+@pytest.mark.parametrize('query, matches', [
+    ('after:2024-02', lambda unit: unit[5] >= parse_date('2024-02')),
+    ('after:2024-01-20 before:2024-02-10', lambda unit: parse_date('2024-01-20') <= unit[5] < parse_date('2024-02-10')),
+    ('in:name before:2024-01-15', lambda unit: unit[0] == FIELDS.index('name') and unit[5] < parse_date('2024-01-15')),
+    ('in:tool after:2024-02-20', lambda unit: FIELDS[unit[0]].startswith('tool_') and unit[5] >= parse_date('2024-02-20')),
+])
+def test_filter_only_queries(data_dir, query, matches):
+    store, index = open_index(data_dir)
+    expected = {uuid for uuid in store.records
+                if any(matches(unit) and tokenize(unit[3]) for unit in iter_units(store.get(uuid)))}
+    assert 0 < len(expected) < len(store)
+    page, total, cursor = index.search(query, limit=len(store))
+    assert {uuid for score, created_at, uuid, hits in page} == expected
+    # Filters alone don't score: newest first
+    assert [created_at for score, created_at, uuid, hits in page] == sorted((r[1] for r in page), reverse=True)
+
+
+def test_bind_drops_cached_rankings(data_dir):
+    store, index = open_index(data_dir)
+    index.rank('python ')
+    index.rank('python ')
+    assert (index.cache_hits, index.cache_misses) == (1, 1)
+    index.bind(store)
+    index.rank('python ')
+    assert (index.cache_hits, index.cache_misses) == (1, 2)
+
+
+def test_ranking_across_bind_is_not_cached(data_dir, monkeypatch):
+    store, index = open_index(data_dir)
+    resolve = index._resolve
+
+    def resolve_during_reload(clauses):
+        index.bind(store)  # another thread rebinds while this query runs
+        return resolve(clauses)
+
+    monkeypatch.setattr(index, '_resolve', resolve_during_reload)
+    index.rank('python ')
+    monkeypatch.setattr(index, '_resolve', resolve)
+    index.rank('python ')
+    assert (index.cache_hits, index.cache_misses) == (0, 2)
+
+
+def test_ranking(tmp_path):
+    data_dir = write_export(tmp_path, [
+        conversation('in-name', 'Kettle descaling', 'how often should I do it'),
+        conversation('once', 'Chores', 'the kettle is making noise again today'),
+        conversation('often', 'Appliances', 'kettle kettle kettle: a kettle that whistles'),
+        conversation('elsewhere', 'Garden', 'tomatoes need sun'),
+    ])
+    store, index = open_index(data_dir)
+    page, total, cursor = index.search('kettle ')
+    assert [uuid for score, created_at, uuid, hits in page] == ['in-name', 'often', 'once']
+    assert total == 3 and cursor is None
+    assert [score for score, created_at, uuid, hits in page] == sorted((r[0] for r in page), reverse=True)
+
+    # Hits point at the unit that matched, best first
+    score, created_at, uuid, hits = page[2]
+    assert [(FIELDS[field], msg_index) for score, field, msg_index, block in hits] == [('message', 0)]
+    snippet, = hit_snippets(store.get(uuid), hits, index.matched_terms('kettle '))
+    assert snippet['message_uuid'] == 'once-0'
+    assert snippet['highlights'] == [[4, 10]]
+
+
+def test_ranking_ties_are_newest_first(tmp_path):
+    data_dir = write_export(tmp_path, [conversation(f'c{day}', 'Same', 'same words', day=day) for day in (3, 1, 2)])
+    store, index = open_index(data_dir)
+    page, total, cursor = index.search('same words')
+    assert [uuid for score, created_at, uuid, hits in page] == ['c3', 'c2', 'c1']
+
+
+def test_cursor_paging(data_dir):
+    store, index = open_index(data_dir)
+    everything, total, cursor = index.search('the ', limit=len(store))
+    assert cursor is None
+
+    paged = []
+    cursor = None
+    while True:
+        page, page_total, cursor = index.search('the ', cursor=cursor, limit=7)
+        assert page_total == total
+        paged.extend(page)
+        if cursor is None:
+            break
+    assert [r[2] for r in paged] == [r[2] for r in everything]
+
+
+def test_cursor_survives_new_results(tmp_path):
+    convs = [conversation(f'c{day}', 'Notes', 'meeting notes', day=day) for day in range(1, 9)]
+    store, index = open_index(write_export(tmp_path / 'before', convs))
+    first, total, cursor = index.search('meeting', limit=3)
+
+    # A conversation that ranks first arrives before the next page is asked for
+    convs.append(conversation('new', 'Meeting', 'meeting notes', day=20))
+    store, index = open_index(write_export(tmp_path / 'after', convs))
+    rest, total, cursor = index.search('meeting', cursor=cursor, limit=10)
+    assert total == 9 and cursor is None
+    assert [r[2] for r in first + rest] == [f'c{day}' for day in range(8, 0, -1)]
+
+
+def test_deep_search_and_filters(tmp_path):
+    tools = conversation('tools', 'Build', 'can you look for it', 'running a search')
+    tools['chat_messages'][1]['content'] = [
+        {'type': 'text', 'text': 'running a search'},
+        {'type': 'tool_use', 'id': 'toolu_1', 'name': 'bash', 'input': {'command': 'grep -rn gadget src'}},
+        {'type': 'tool_result', 'tool_use_id': 'toolu_1', 'content': [{'type': 'text', 'text': 'src/gizmo.py'}]},
+    ]
+    attached = conversation('attached', 'Reading', 'see the file')
+    attached['chat_messages'][0]['attachments'] = [
+        {'file_name': 'spec.txt', 'extracted_content': 'the gadget must be blue'}]
+    said = conversation('said', 'Chat', 'hello', 'a gadget and a gizmo')
+    store, index = open_index(write_export(tmp_path, [tools, attached, said]))
+
+    def found(query):
+        return {uuid for score, created_at, uuid, hits in index.search(query)[0]}
+
+    assert found('gadget ') == {'tools', 'attached', 'said'}
+    assert found('gadget tool:bash') == {'tools'}
+    assert found('gizmo tool:bash') == {'tools'}  # results take the name of their call
+    assert found('gadget tool:repl') == set()
+    assert found('gadget in:attachment') == {'attached'}
+    assert found('gizmo in:tool') == {'tools'}
+    assert found('gadget in:message') == {'said'}
+    assert found('gadget from:human') == {'attached'}
+    assert found('gadget from:assistant') == {'tools', 'said'}
+    # Repeated filters of one kind match either value
+    assert found('gadget in:attachment in:message') == {'attached', 'said'}
+    with pytest.raises(ValueError):
+        index.search('gadget in:nowhere')
+
+    # Snippets name the tool or file the hit is in
+    page, total, cursor = index.search('gadget in:tool')
+    snippet, = hit_snippets(store.get('tools'), page[0][3], index.matched_terms('gadget '))
+    assert (snippet['field'], snippet['tool'], snippet['sender']) == ('tool_use', 'bash', 'assistant')
+    page, total, cursor = index.search('gadget in:attachment')
+    snippet, = hit_snippets(store.get('attached'), page[0][3], index.matched_terms('gadget '))
+    assert (snippet['field'], snippet['file_name']) == ('attachment', 'spec.txt')
@@ -0,0 +1,173 @@
+"""Tests for the server's helpers."""
+
+import gzip
+import io
+import json
+import threading
+import time
+
+import pytest
+
+import server
+from export import write_ndjson
+from search_index import iter_units, tokenize
+from server import ChunkedWriter, ResponseCache, parse_range
+
+
+@pytest.fixture
+def explorer(data_dir, monkeypatch):
+    """Point the server at the synthetic export; it is loaded on first use."""
+    monkeypatch.setattr(server, 'DATA_DIR', data_dir)
+    monkeypatch.setattr(server, 'INDEX_DIR', data_dir / '.claude-explorer')
+    monkeypatch.setattr(server, 'INGEST_WORKERS', 1)
+    for name in ('store', 'search_index', 'rollups'):
+        monkeypatch.setattr(server, name, None)
+    return server
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-4', (0, 4)),
+    ('bytes=5-', (5, 9)),
+    ('bytes=8-100', (8, 9)),    # end past the file is clipped
+    ('bytes=-3', (7, 9)),       # suffix
+    ('bytes=-100', (0, 9)),     # suffix longer than the file
+    (None, None),
+    ('', None),
+    ('items=0-4', None),
+    ('bytes=0-1,4-5', None),    # multi-range is served in full
+    ('bytes=x-4', None),
+    ('bytes=-', None),
+    ('bytes=--3', None),
+    ('bytes=4-2', None),        # last before first is invalid, not unsatisfiable
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 10) == expected
+
+
+@pytest.mark.parametrize('header, size', [
+    ('bytes=10-', 10),
+    ('bytes=20-30', 10),
+    ('bytes=-0', 10),
+    ('bytes=-5', 0),
+    ('bytes=0-', 0),
+])
+def test_parse_range_unsatisfiable(header, size):
+    with pytest.raises(ValueError):
+        parse_range(header, size)
+
+
+def test_chunked_writer():
+    out = io.BytesIO()
+    writer = ChunkedWriter(out)
+    writer.write(b'hello ')
+    writer.write(b'world')
+    writer.close()
+    assert out.getvalue() == b'b\r\nhello world\r\n0\r\n\r\n'
+
+
+def test_chunked_writer_gzip_unchunked():
+    out = io.BytesIO()
+    writer = ChunkedWriter(out, 'gzip', chunked=False)
+    writer.write(b'x' * 100000)
+    writer.close()
+    assert gzip.decompress(out.getvalue()) == b'x' * 100000
+
+
+def test_chunked_writer_flush():
+    out = io.BytesIO()
+    writer = ChunkedWriter(out)
+    writer.write(b'hello ')
+    writer.flush()
+    writer.write(b'world')
+    writer.close()
+    assert out.getvalue() == b'6\r\nhello \r\n5\r\nworld\r\n0\r\n\r\n'
+
+
+def test_export_query_takes_every_match(explorer):
+    convs, records = explorer.select_conversations(query='the ')
+    expected = {uuid for uuid in convs.records
+                if any('the' in tokenize(unit[3]) for unit in iter_units(convs.get(uuid)))}
+    assert 0 < len(expected) < len(convs)
+
+    out = io.BytesIO()
+    assert write_ndjson(out, convs, records) == len(expected)
+    assert {json.loads(line)['uuid'] for line in out.getvalue().splitlines()} == expected
+
+
+def test_watcher_reloads_changed_exports(explorer, monkeypatch):
+    monkeypatch.setattr(server, 'WATCH_INTERVAL', 0.01)
+    old = explorer.load_conversations()
+    polled = threading.Event()
+    poll = server.poll_data_signature
+
+    def signalling_poll():
+        try:
+            return poll()
+        finally:
+            polled.set()
+
+    monkeypatch.setattr(server, 'poll_data_signature', signalling_poll)
+    stop = threading.Event()
+    watcher = threading.Thread(target=explorer.watch_data_dir, args=(stop,))
+    watcher.start()
+    try:
+        # Change the files only once the watcher has seen them as they were
+        assert polled.wait(10)
+        conv = {'uuid': 'new', 'name': 'Fresh', 'created_at': '2030-01-01T00:00:00Z', 'chat_messages': [
+            {'uuid': 'm', 'sender': 'human', 'text': 'zyzzyva arrived'}]}
+        (explorer.DATA_DIR / 'conversations 3.json').write_text(json.dumps([conv]))
+        deadline = time.monotonic() + 10
+        while explorer.store is old and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        stop.set()
+        watcher.join()
+
+    # The new store, search index and stats are published together
+    assert explorer.store is not old
+    assert len(explorer.store) == len(old) + 1
+    assert explorer.get_conversation_list()[0]['uuid'] == 'new'
+    page, total, cursor = explorer.get_search_index().search('zyzzyva ')
+    assert [r[2] for r in page] == ['new']
+    # Requests that started before the swap can still read the old store
+    assert old.get(next(iter(old.records)))
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(10)
+    cache.put('a', 'A', 4)
+    cache.put('b', 'B', 4)
+    assert cache.get('a') == 'A'  # now b is the least recently used
+    cache.put('c', 'C', 4)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == ('A', 'C')
+    assert cache.stats() == {'entries': 2, 'bytes': 8, 'hits': 3, 'misses': 1, 'evictions': 1}
+
+
+def test_response_cache_replaces_and_skips_oversized():
+    cache = ResponseCache(10)
+    cache.put('a', 'A', 4)
+    cache.put('a', 'AA', 6)
+    assert cache.get('a') == 'AA'
+    assert cache.stats()['bytes'] == 6
+
+    # Too big to cache at all, so nothing is evicted to make room
+    cache.put('big', 'BIG', 11)
+    assert cache.get('big') is None
+    assert cache.get('a') == 'AA'
+    assert cache.stats()['evictions'] == 0
+
+
+def test_export_selection(explorer):
+    convs = explorer.load_conversations()
+    newest = [c['uuid'] for c in convs.list()]
+    ids = [newest[5], 'unknown', newest[0], newest[5]]
+    assert [rec.uuid for rec in explorer.select_conversations(ids)[1]] == [newest[5], newest[0]]
+
+    # after is inclusive and before exclusive
+    middle = convs.records[newest[60]].created_at
+    records = explorer.select_conversations(after=middle)[1]
+    assert {rec.uuid for rec in records} == set(newest[:61])
+    records = explorer.select_conversations(query='the ', before=middle)[1]
+    assert records and all(rec.created_at < middle for rec in records)
+    assert {rec.uuid for rec in records} <= set(newest[61:])
@@ -0,0 +1,32 @@
+"""Tests for the stats rollups."""
+
+import pytest
+
+from stats import Rollups
+from store import conversation_record
+
+
+def conversation(uuid, day, messages, updated='2024-01-05T00:00:00Z'):
+    return {
+        'uuid': uuid,
+        'created_at': f'2024-01-{day:02d}T10:00:00Z',
+        'updated_at': updated,
+        'chat_messages': [{'sender': 'human' if i % 2 == 0 else 'assistant', 'text': 'x' * (i + 1),
+                           'created_at': f'2024-01-{day:02d}T10:0{i}:00Z'} for i in range(messages)],
+    }
+
+
+def test_rollups_updated_matches_full_recount():
+    a = conversation_record(conversation('a', 1, 2), 'f', 0, 100)
+    b = conversation_record(conversation('b', 2, 3), 'f', 100, 200)
+    b_edited = conversation_record(conversation('b', 3, 5, updated='2024-02-01T00:00:00Z'), 'f', 100, 300)
+    c = conversation_record(conversation('c', 2, 1), 'f', 300, 50)
+
+    first = Rollups().updated({'a': a, 'b': b})
+    before = first.query()
+    second = first.updated({'a': a, 'b': b_edited, 'c': c})
+
+    assert second.query() == Rollups().updated({'a': a, 'b': b_edited, 'c': c}).query()
+    # The rollups being replaced are left as they were
+    assert first.query() == before
+    assert first.query()['totals']['messages'] == {'human': 3, 'assistant': 2}
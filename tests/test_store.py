@@ -0,0 +1,189 @@
+"""Tests for the conversation store and its streaming parser."""
+
+import io
+import json
+import os
+
+import pytest
+
+import store as store_module
+from store import ConversationStore, StaleRecordError, iter_json_array
+
+
+def elements(data, chunk_size=4):
+    """Run iter_json_array over bytes with a small chunk size, so elements span reads."""
+    return list(iter_json_array(io.BytesIO(data), chunk_size))
+
+
+def check_offsets(data, result):
+    for value, offset, length in result:
+        assert json.loads(data[offset:offset + length]) == value
+
+
+@pytest.mark.parametrize('chunk_size', [2, 3, 4, 1024])
+def test_iter_json_array_offsets(chunk_size):
+    data = b' [ {"a": 1}, [2, 3] ,"x", true, null ]\n'
+    result = elements(data, chunk_size)
+    assert [value for value, _, _ in result] == [{'a': 1}, [2, 3], 'x', True, None]
+    check_offsets(data, result)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 5, 1024])
+def test_iter_json_array_multibyte_offsets(chunk_size):
+    # Offsets count bytes, not characters, and reads may split a character
+    values = [{'name': 'café ☕'}, {'name': '日本語'}, {'name': '😀 emoji'}, 'ascii']
+    data = json.dumps(values, ensure_ascii=False).encode('utf-8')
+    result = elements(data, chunk_size)
+    assert [value for value, _, _ in result] == values
+    check_offsets(data, result)
+
+
+def test_iter_json_array_bom():
+    data = '\ufeff[{"a": "é"}, {"b": 2}]'.encode('utf-8')
+    result = elements(data)
+    assert [value for value, _, _ in result] == [{'a': 'é'}, {'b': 2}]
+    check_offsets(data, result)
+
+
+def test_iter_json_array_top_level_object():
+    data = b'{"uuid": "x"}'
+    assert elements(data) == [({'uuid': 'x'}, 0, len(data))]
+
+
+@pytest.mark.parametrize('data', [b'', b'  \n', b'[]', b'[ ]'])
+def test_iter_json_array_empty(data):
+    assert elements(data) == []
+
+
+@pytest.mark.parametrize('data', [
+    b'[{"a": 1}, {"b": 2}, {"c": ',  # cut inside an element
+    b'[{"a": 1}, {"b": 2},',         # cut after a comma
+    b'[{"a": 1}, {"b": 2}',          # missing the closing bracket
+])
+def test_iter_json_array_truncated(data):
+    result = []
+    with pytest.raises(json.JSONDecodeError):
+        for item in iter_json_array(io.BytesIO(data), 4):
+            result.append(item)
+    # Everything complete before the damage is still yielded
+    assert [value for value, _, _ in result] == [{'a': 1}, {'b': 2}]
+    check_offsets(data, result)
+
+
+def test_iter_json_array_truncated_multibyte():
+    data = '[{"a": "é"}, {"b": "日本'.encode('utf-8')[:-1]  # cut inside a character
+    result = []
+    with pytest.raises(ValueError):
+        for item in iter_json_array(io.BytesIO(data), 3):
+            result.append(item)
+    assert [value for value, _, _ in result] == [{'a': 'é'}]
+
+
+def test_iter_json_array_missing_comma():
+    with pytest.raises(json.JSONDecodeError):
+        elements(b'[1 2]')
+
+
+@pytest.mark.parametrize('data, values', [
+    (b'[123456789, 2]', [123456789, 2]),
+    (b'[4.5, 1]', [4.5, 1]),
+    (b'[4e+10,-1.5E-3]', [4e+10, -1.5e-3]),
+    (b'12.5', [12.5]),
+])
+def test_iter_json_array_number_split_across_reads(data, values):
+    # Every read ends inside a number at some point
+    assert [value for value, _, _ in elements(data, 1)] == values
+
+
+def test_list_serves_timestamps_as_exported(tmp_path):
+    convs = [
+        {'uuid': 'a', 'created_at': '2024-03-01T12:00:00+02:00', 'updated_at': '2024-03-02T08:00:00Z'},
+        {'uuid': 'b', 'created_at': '2024-03-01T11:00:00Z', 'updated_at': 'yesterday'},
+        {'uuid': 'c'},
+    ]
+    (tmp_path / 'conversations 1.json').write_text(json.dumps(convs))
+    listed = ConversationStore(tmp_path).open(workers=1).list()
+
+    # Newest first by the parsed time: 11:00Z is after 12:00+02:00
+    assert [(c['uuid'], c['created_at'], c['updated_at']) for c in listed] == [
+        ('b', '2024-03-01T11:00:00Z', 'yesterday'),
+        ('a', '2024-03-01T12:00:00+02:00', '2024-03-02T08:00:00Z'),
+        ('c', '', ''),
+    ]
+
+
+def write_convs(path, uuids):
+    convs = [{'uuid': uuid, 'name': f'Chat {uuid}', 'created_at': f'2024-03-01T10:00:0{i}Z'}
+             for i, uuid in enumerate(uuids)]
+    path.write_text(json.dumps(convs))
+
+
+def test_refresh_reparses_only_changed_files(tmp_path, monkeypatch):
+    write_convs(tmp_path / 'conversations 1.json', ['a', 'b'])
+    write_convs(tmp_path / 'conversations 2.json', ['c'])
+    store = ConversationStore(tmp_path).open(workers=1)
+    assert set(store.records) == {'a', 'b', 'c'}
+    assert store.refresh(workers=1) is None
+
+    parsed = []
+    scan_file = store_module.scan_file
+
+    def counting_scan_file(path, *args):
+        parsed.append(path.name)
+        return scan_file(path, *args)
+
+    monkeypatch.setattr(store_module, 'scan_file', counting_scan_file)
+    write_convs(tmp_path / 'conversations 2.json', ['c', 'd'])
+    assert store.refresh(workers=1) == []
+    assert parsed == ['conversations 2.json']
+    assert set(store.records) == {'a', 'b', 'c', 'd'}
+    assert store.get('d')['name'] == 'Chat d'
+
+
+def test_refresh_skips_touched_identical_files(tmp_path):
+    path = tmp_path / 'conversations 1.json'
+    write_convs(path, ['a'])
+    store = ConversationStore(tmp_path).open(workers=1)
+    generation = store.generation
+    os.utime(path, ns=(0, 0))
+    assert store.refresh(workers=1) is None
+    assert store.generation == generation
+    assert store.files['conversations 1.json']['mtime'] == 0
+
+
+def test_refresh_drops_removed_files(tmp_path):
+    write_convs(tmp_path / 'conversations 1.json', ['a', 'b'])
+    write_convs(tmp_path / 'conversations 2.json', ['b', 'c'])
+    store = ConversationStore(tmp_path).open(workers=1)
+    # Later files win when a conversation appears twice
+    assert store.records['b'].file == 'conversations 2.json'
+
+    (tmp_path / 'conversations 2.json').unlink()
+    store.refresh(workers=1)
+    assert set(store.records) == {'a', 'b'}
+    assert store.records['b'].file == 'conversations 1.json'
+
+
+def test_saved_index_is_reused(tmp_path, monkeypatch):
+    write_convs(tmp_path / 'conversations 1.json', ['a', 'b'])
+    ConversationStore(tmp_path).open(workers=1)
+
+    monkeypatch.setattr(store_module, 'scan_files', lambda *args: pytest.fail("reparsed an unchanged file"))
+    store = ConversationStore(tmp_path).open(workers=1)
+    assert [c['uuid'] for c in store.list()] == ['b', 'a']
+    assert store.get('a')['name'] == 'Chat a'
+
+
+def test_read_after_file_changed_is_stale(tmp_path):
+    path = tmp_path / 'conversations 1.json'
+    write_convs(path, ['a', 'b'])
+    store = ConversationStore(tmp_path).open(workers=1)
+    assert store.get('b')['uuid'] == 'b'
+
+    # A new export copied over the old one in place, before any refresh
+    write_convs(path, ['a'])
+    with pytest.raises(StaleRecordError):
+        store.get('b')
+    store.refresh(workers=1)
+    assert 'b' not in store
+    assert store.get('a')['uuid'] == 'a'